@@ -0,0 +1,85 @@
+from contextlib import contextmanager
+from typing import List
+import json
+
+# Non instantiable class writing the per item details of a run to a JSON lines file
+class Details:
+
+    ### Privates properties ###
+
+    # Details file (None when disabled)
+    _file = None
+
+    # Captured items (None when not capturing)
+    _captured: List[dict] = None
+
+    ### Init ###
+
+    # Open the details file
+    @classmethod
+    def open(cls, path: str):
+        """Open the details file, one JSON object per line
+
+        Args:
+            path (str): The details file, None or empty to disable the details
+        """
+        cls.close()
+        if path:
+            cls._file = open(path, "w", encoding="utf-8")
+
+    # Verify if the details are written or captured
+    @classmethod
+    def isEnabled(cls) -> bool:
+        return cls._file is not None or cls._captured is not None
+
+    # Close the details file
+    @classmethod
+    def close(cls):
+        if cls._file is not None:
+            cls._file.close()
+            cls._file = None
+
+    ### Items ###
+
+    # Write an item
+    @classmethod
+    def write(cls, event: str, **fields):
+        """Write an item
+
+        Args:
+            event (str): The kind of item
+            **fields: The fields of the item
+        """
+        # Capture the item
+        if cls._captured is not None:
+            cls._captured.append({"event": event, **fields})
+        # Or write it
+        elif cls._file is not None:
+            cls._file.write(json.dumps({"event": event, **fields}) + "\n")
+
+    # Capture the items instead of writing them
+    @classmethod
+    @contextmanager
+    def capture(cls):
+        """Capture the items, in a worker, to write them later in the main process
+
+        Yields:
+            List[dict]: The captured items
+        """
+        previous, cls._captured = cls._captured, []
+        try:
+            yield cls._captured
+        finally:
+            cls._captured = previous
+
+    # Write captured items
+    @classmethod
+    def replay(cls, items: List[dict], **fields):
+        """Write captured items
+
+        Args:
+            items (List[dict]): The captured items
+            **fields: Fields added to each item
+        """
+        for item in items:
+            cls.write(**{**item, **fields})
@@ -3,11 +3,17 @@ from pathlib import Path
 import re
 from broken_path import repair_path
 import globvar
-import logging
 import shutil
 from PathMachine import PathMachine
-from mylog import display
-from config.config import PROPERTY_CONFIG
+from PackPath import PackPath
+from ReferenceCache import ReferenceCache
+from RunStats import RunStats
+from mylog import display, capture, replay, flush, getLevels, setLevels
+from typing import Callable, Dict, Iterable, List, Tuple
+import io
+import os
+from config import config
+import json
 
 # Regex to match a path
 regex_path = re.compile(r"(?:(?:[A-Z]:[/\\])|(?:[/\\]?))(?:[^\n\r><:*\"/\\|?]*[/\\]?)")
@@ -21,19 +27,28 @@ exts = [".properties", ".mcmeta", ".png", ".json", ".jemc", ".jem", ".jpm", ".jp
 
 class File:
 
+    # Only the interned pack path is stored, the other paths are computed on demand
+    __slots__ = ("_packRelativePath",)
+
     file_dict = {}
 
     def __init__(self, path: Path):
-        # Path variable
-        self._packRelativePath = path.resolve()
-        self.path = PathMachine.transformPathToSystemPath(self._packRelativePath)
-
-        # Parent directory
-        self._packRelativeParent = self._packRelativePath.parent
+        # Path variable (interned, shared with the PathMachine tree)
+        self._packRelativePath = PackPath.of(path)
 
         # Add the file to the file dictionary
         File.addFile(self)
 
+    # System path
+    @property
+    def path(self) -> Path:
+        return PathMachine.transformPathToSystemPath(self._packRelativePath)
+
+    # Parent directory
+    @property
+    def _packRelativeParent(self) -> PackPath:
+        return self._packRelativePath.parent
+
     # Method to add a file to the file dictionary
     @classmethod
     def addFile(cls, file: File):
@@ -58,6 +73,18 @@ class File:
     def rewrite(self):
         pass
 
+    # Generic render method, give the new content of the file (None if not rewritable)
+    def render(self) -> bytes:
+        return None
+
+    # Generic result of handleReferences, sent back from the analysis workers (None if nothing to apply)
+    def getResolved(self):
+        return None
+
+    # Apply a result of handleReferences
+    def setResolved(self, resolved):
+        pass
+
     # File name
     @property
     def name(self):
@@ -88,6 +115,8 @@ class File:
 
 class PropertyFile(File):
 
+    __slots__ = ("_properties", "_contentHash")
+
     def __init__(self, path: Path):
         # Call the super class constructor
         super().__init__(path)
@@ -97,125 +126,100 @@ class PropertyFile(File):
 
     # Verify if property can contain a path
     def possiblePathProperty(self, key: str):
-        # Check if the key is in the non path properties
-        for non_path in PROPERTY_CONFIG.non_path_properties:
-            # If the non_path is a regex
-            if PROPERTY_CONFIG.non_path_properties[non_path] and re.match(non_path, key):
-                # Return false
-                return False
-            elif key == non_path:
-                # Return false
-                return False
-        # Return true
-        return True
+        # Return the classification of the key
+        return config.PROPERTY_CONFIG.classifyKey(key)[0]
 
     # Get expected extensions for a key
     def getExpectedExtensions(self, key: str):
-        # Check if the key is in the expected extensions
-        for expected_extension in PROPERTY_CONFIG.properties_expected_extensions:
-            # If match
-            if re.match(expected_extension, key):
-                # Return the expected extensions
-                return PROPERTY_CONFIG.properties_expected_extensions[expected_extension]
-        # Return empty list
-        return []
+        # Return the classification of the key
+        return config.PROPERTY_CONFIG.classifyKey(key)[1]
 
     # Get all the values in the file
     def parse(self):
-        """_summary_
-
-        Returns:
-            dict: A dictionary containing all the properties
+        """Parse the properties of the file
         """
 
-        # Dictionary of properties
-        self._properties = {}
+        # Without cache, stream the lines of the file
+        if not ReferenceCache.isEnabled():
+            self._contentHash = None
+            with PathMachine.openFile(self._packRelativePath) as f:
+                self._properties = parseProperties(io.TextIOWrapper(f, "ISO-8859-1", newline=None))
+            return
 
         # Read the file
-        with open(self.path, "r", encoding="ISO-8859-1") as f:
-            content = f.read()
-
-        # Loop through all the lines
-        for line in content.splitlines():
-            try:
-                # If the line is a comment or empty
-                if line.strip().startswith("#") or line.strip().startswith("#"):
-                    # Skip the comment
-                    continue
-                elif not line.strip():
-                    # Skip empty lines
-                    continue
-                # Split the line into key and value
-                key = line.split("=")[0]
-                value = '='.join(line.split("=")[1:])
-                # If key or value is empty
-                if not key or not value:
-                    # Skip the line
-                    continue
-                # Add the key and value to the dictionary
-                self._properties[key.strip()] = value.strip()
-            except:
-                print("Error reading line: " + line + " in file: " + str(self.path) + ". Skipping line because it's not recognized as property.", fflush=True)
-                logging.warning("Error reading line: " + line + " in file: " + str(self.path) + ". Skipping line because it's not recognized as property.")
+        content = PathMachine.readFile(self._packRelativePath)
+
+        # Use the properties parsed by a previous run
+        self._contentHash = ReferenceCache.contentHash(content)
+        cached = ReferenceCache.getProperties(self._packRelativePath, self._contentHash)
+        if cached is not None:
+            self._properties = cached
+            return
+
+        # Parse the lines, split like the streamed ones (\n, \r or \r\n as in Java)
+        self._properties = parseProperties(io.StringIO(content.decode("ISO-8859-1"), newline=None))
+
+        # Save the properties for the next runs
+        ReferenceCache.setProperties(self._packRelativePath, self._contentHash, self._properties)
 
     # Find all the references in the file and add them to the references list
     def handleReferences(self):
         """_summary_
         """
         # If file in excluded paths
-        for excluded_path in PROPERTY_CONFIG.excluded_pack_paths:
-            if re.match(excluded_path, str(self._packRelativePath)):
-                # Log
-                display("Skipping file: " + str(self._packRelativePath) + " because it's in the excluded paths list.", "info")
-                # Skip file
-                return
+        if config.PROPERTY_CONFIG.isExcludedPath(str(self._packRelativePath)):
+            # Log
+            display("Skipping file: %s because it's in the excluded paths list.", self._packRelativePath, level="info")
+            # Skip file
+            return
         # Log
-        display("Finding references in property file: " + str(self._packRelativePath), "info")
+        display("Finding references in property file: %s", self._packRelativePath, level="info")
         # Loop through all the properties
         for key, value in self._properties.items():
+            # Classify the key
+            possible_path, expected_extensions = config.PROPERTY_CONFIG.classifyKey(key)
             # If the key is a non path property
-            if not self.possiblePathProperty(key):
+            if not possible_path:
                 continue
             # Log
-            display("Checking property: " + key, "info")
-            # Get expected extensions
-            expected_extensions = self.getExpectedExtensions(key)
+            display("Checking property: %s", key, level="info")
             # If no expected extensions
             if not expected_extensions and expected_extensions != None:
                 # Warn
-                display("Exepected extensions are not defined for key: '" + key + "' . Even if it does not break the process, it will be less precise. Contact the developper to add expected extensions.", "warning")
+                display("Exepected extensions are not defined for key: '%s' . Even if it does not break the process, it will be less precise. Contact the developper to add expected extensions.", key, level="warning")
             # If the value is not a path, warning
             if not regex_path.match(value) and (expected_extensions or expected_extensions == None):
-                display("Value: '" + value + "' for property '" + key + " is not a path.", "warning")
+                display("Value: '%s' for property '%s is not a path.", value, key, level="warning")
                 continue
             
             # Try to resolve the path
-            display("Resolving path: " + value + " for property: " + key, "info")
+            display("Resolving path: %s for property: %s", value, key, level="info")
             path = PathMachine.resolvePath(Path(value), self._packRelativePath, expected_extensions)
 
             # If the path is not None, warn and continue
             if path == None:
-                display("Path: '" + value + "' for property '" + key + "' can't be resolved.", "warning")
+                display("Path: '%s' for property '%s' can't be resolved.", value, key, level="warning")
                 continue
             else:
-                display("Path: '" + value + "' for property '" + key + "' resolved to: " + str(path), "info")
+                display("Path: '%s' for property '%s' resolved to: %s", value, key, path, level="info")
 
             # Try to convert to relative path
+            target = path
             relative_path = PathMachine.getRelativePath(self._packRelativePath, path)
             if relative_path == None:
-                display("Path: '" + str(path) + "' for property '" + key + "' can't be converted to good relative path, continue with absolute.", "info")
+                display("Path: '%s' for property '%s' can't be converted to good relative path, continue with absolute.", path, key, level="info")
             else:
-                display("Path: '" + str(path) + "' for property '" + key + "' converted to relative path: " + str(relative_path), "info")
+                display("Path: '%s' for property '%s' converted to relative path: %s", path, key, relative_path, level="info")
                 path = relative_path
 
+            # Repair broken path, as planned for the target
+            path = PathMachine.repairPath(path, target)
+
             # If the path had no extension
             if not Path(value).suffix:
                 # Remove the extension of the path
                 path = Path(path).with_suffix("")
 
-            # Repair broken path
-            path = PathMachine.repairPath(path)
-
             # Change value in properties
             self._properties[key] = path
 
@@ -224,16 +228,327 @@ class PropertyFile(File):
         """_summary_
         """
         # Log
-        display("Rewriting property file: " + str(self.path), "info")
-        # List of property lines
-        lines = [key + " = " + str(value) + "\n" for key, value in self._properties.items()]
-        # Open the file
-        with open(self.path, "w", encoding="ISO-8859-1") as f:
-            # Write properties
-            f.writelines(lines)
+        display("Rewriting property file: %s", self.path, level="info")
+        # Write properties
+        with open(self.path, "wb") as f:
+            f.write(self.render())
+
+    # Resolved properties
+    def getResolved(self) -> Dict[str, object]:
+        return getattr(self, "_properties", None)
+
+    # Set the resolved properties
+    def setResolved(self, resolved: Dict[str, object]):
+        self._properties = resolved
+
+    # Render property file
+    def render(self) -> bytes:
+        """Render the properties as the content of the file
+
+        Returns:
+            bytes: The content of the file
+        """
+        # Join the property lines
+        return "".join(key + " = " + str(value) + "\n" for key, value in self._properties.items()).encode("ISO-8859-1")
+
+# Unescaped key separator of a property line
+regex_separator = re.compile(r"(?<!\\)(?:\\\\)*[=:]")
+
+# Parse property lines
+def parseProperties(lines: Iterable[str]) -> Dict[str, str]:
+    """Parse property lines, following the Java properties format
+
+    Comments start with # or !, the key ends at the first unescaped = or :,
+    and a line ending with an odd number of backslashes continues on the next one.
+    Values are kept raw (escapes are not interpreted).
+
+    Args:
+        lines (Iterable[str]): The lines, with or without line endings
+
+    Returns:
+        Dict[str, str]: The properties
+    """
+
+    # Dictionary of properties
+    properties = {}
+
+    # Logical line continued on the next line
+    pending = None
+
+    # Loop through all the lines
+    for line in lines:
+        # Continuation of the previous line
+        continued = pending is not None
+        if continued:
+            line, pending = pending + line.lstrip(), None
+        stripped = line.strip()
+        # Skip empty lines and comments
+        if not stripped or (stripped[0] in "#!" and not continued):
+            continue
+        # Line continued on the next one (odd number of final backslashes)
+        if stripped[-1] == "\\":
+            line = line.rstrip("\r\n")
+            if (len(line) - len(line.rstrip("\\"))) % 2:
+                pending = line[:-1]
+                continue
+        # Add the property
+        addProperty(properties, stripped)
+
+    # Flush a continued last line
+    if pending is not None:
+        addProperty(properties, pending.strip())
+
+    # Return the properties
+    return properties
+
+# Add a property line to the properties
+def addProperty(properties: Dict[str, str], line: str):
+    # Split at the first separator
+    key, separator, value = line.partition("=")
+    if ":" in key:
+        key, separator, value = line.partition(":")
+    # Separators may be escaped
+    if "\\" in key:
+        match = regex_separator.search(line)
+        if not match:
+            return
+        key, value = line[:match.end() - 1], line[match.end():]
+    # Skip lines without key or value
+    key, value = key.strip(), value.strip()
+    if key and value:
+        # Add the key and value to the dictionary
+        properties[key] = value
+
+# String or structural token of a JSON document
+json_token = re.compile(r'"((?:[^"\\]|\\.)*)"|([{}\[\]:,])', re.S)
+
+# Decode the content of a JSON string literal
+def decodeJsonString(raw: str) -> str:
+    # Only strings with escapes need the decoder
+    return json.loads('"' + raw + '"') if "\\" in raw else raw
+
+# Iterate over the string values of a JSON document
+def iterJsonStrings(text: str) -> Iterable[Tuple[str, str, int, int]]:
+    """Iterate over the string values of a JSON document, without building it
+
+    Arrays are transparent in the key paths: the strings of {"models": [{"model": "a"}]} have the key path "models.model".
+
+    Args:
+        text (str): The JSON document
+
+    Yields:
+        Tuple[str, str, int, int]: The key path, the raw content of the string literal and the span of this content
+    """
+    # Keys of the enclosing members
+    keys = []
+    # Open containers as (is object, pushed a key)
+    stack = []
+    # Key of the current member and if the next string is a key
+    key = None
+    expect_key = False
+    # For each token
+    for match in json_token.finditer(text):
+        char = match.group(2)
+        # String
+        if char is None:
+            if expect_key:
+                key = decodeJsonString(match.group(1))
+                expect_key = False
+            elif stack and stack[-1][0]:
+                yield ".".join(keys + [key]) if keys else key, match.group(1), match.start(1), match.end(1)
+            else:
+                yield ".".join(keys), match.group(1), match.start(1), match.end(1)
+        # Open an object or an array, a member value pushes its key
+        elif char == "{" or char == "[":
+            pushed = bool(stack) and stack[-1][0] and key is not None
+            if pushed:
+                keys.append(key)
+            stack.append((char == "{", pushed))
+            expect_key = char == "{"
+        # Close an object or an array
+        elif char == "}" or char == "]":
+            if stack and stack.pop()[1]:
+                keys.pop()
+            expect_key = False
+        # Next member of an object
+        elif char == ",":
+            expect_key = bool(stack) and stack[-1][0]
+        # Value of the member
+        else:
+            expect_key = False
+
+class JsonFile(File):
+    """JSON file (models, blockstates, mcmeta), its references are namespaced ids unless they are explicitly relative"""
+
+    __slots__ = ("_replacements",)
+
+    # Prefixes of the explicitly relative or absolute paths
+    path_prefixes = ("./", "../", "~/", "/")
+
+    def __init__(self, path: Path):
+        # Call the super class constructor, the file is only read when its references are handled
+        super().__init__(path)
+
+        # New contents of the changed string spans, as (start, end, content)
+        self._replacements: List[Tuple[int, int, str]] = []
+
+    # Verify if a value is a namespaced id
+    def isId(self, value: str) -> bool:
+        return ":" in value or not value.startswith(self.path_prefixes)
+
+    # Resolve a namespaced id
+    def resolveId(self, value: str, expected_extensions: List[str]) -> Tuple[Path, str]:
+        """Resolve a namespaced id (namespace:path, minecraft by default)
+
+        Args:
+            value (str): The id
+            expected_extensions (List[str]): The expected extensions
+
+        Returns:
+            Tuple[Path, str]: The resolved path (None if not in the pack) and its folder prefix
+        """
+        # Split the namespace
+        namespace, _, name = value.rpartition(":")
+        folder = config.JSON_CONFIG.namespace_folders.get(expected_extensions[0]) if expected_extensions else None
+        if not folder:
+            return None, None
+        prefix = f"/assets/{namespace or 'minecraft'}/{folder}/"
+        # Validate the path in the tree
+        path = PackPath.of(prefix + name + ("" if Path(name).suffix else expected_extensions[0]))
+        return PathMachine.validateAbsolutePath(path, []), prefix
+
+    # Find the references in the file
+    def handleReferences(self):
+        """Find the references of the file and the new content of the broken ones
+        """
+        # If file in excluded paths
+        if config.JSON_CONFIG.isExcludedPath(str(self._packRelativePath)):
+            display("Skipping file: %s because it's in the excluded paths list.", self._packRelativePath, level="debug")
+            return
+        # Log
+        display("Finding references in JSON file: %s", self._packRelativePath, level="info")
+        # Read the document
+        try:
+            text = PathMachine.readFile(self._packRelativePath).decode("utf-8-sig")
+        except UnicodeDecodeError:
+            display("File: %s is not UTF-8, skipping it.", self._packRelativePath, level="warning")
+            return
+        # Loop through the string values
+        self._replacements = []
+        for key_path, raw, start, end in iterJsonStrings(text):
+            # Classify the key path
+            expected_extensions = config.JSON_CONFIG.classifyKey(key_path)
+            if expected_extensions is None:
+                continue
+            # Texture variables (#name) are not paths
+            value = decodeJsonString(raw)
+            if not value or value.startswith("#"):
+                continue
+            # Find the new value
+            new = self.repairId(value, key_path, expected_extensions) if self.isId(value) else self.repairReference(value, key_path, expected_extensions)
+            if new is not None and new != value:
+                display("Reference: '%s' for key '%s' repaired to: %s", value, key_path, new, level="info")
+                self._replacements.append((start, end, json.dumps(new, ensure_ascii=False)[1:-1]))
+
+    # Repair a namespaced id
+    def repairId(self, value: str, key_path: str, expected_extensions: List[str]) -> str:
+        # Resolve the id in the pack
+        path, prefix = self.resolveId(value, expected_extensions)
+        if path is None:
+            # Not in the pack (vanilla or other pack)
+            display("Id: '%s' for key '%s' is not in the pack.", value, key_path, level="debug")
+            RunStats.count("references.external")
+            return None
+        display("Id: '%s' for key '%s' resolved to: %s", value, key_path, path, level="info")
+        RunStats.count("references.direct")
+        PathMachine.addReference(self._packRelativePath, path)
+        # Repair the path and give it back as an id
+        repaired = str(PathMachine.repairPath(path, path))
+        name = repaired[len(prefix):] if repaired.startswith(prefix) else repaired
+        if not Path(value.rpartition(":")[2]).suffix:
+            name = str(Path(name).with_suffix(""))
+        namespace = value.rpartition(":")[0]
+        return f"{namespace}:{name}" if ":" in value else name
+
+    # Repair a path reference
+    def repairReference(self, value: str, key_path: str, expected_extensions: List[str]) -> str:
+        # Resolve the path
+        path = PathMachine.resolvePath(Path(value), self._packRelativePath, expected_extensions)
+        if path is None:
+            display("Path: '%s' for key '%s' can't be resolved.", value, key_path, level="warning")
+            return None
+        display("Path: '%s' for key '%s' resolved to: %s", value, key_path, path, level="info")
+        # Unchanged when the target is not broken
+        target = path
+        if PathMachine.repairPath(path, target) == path:
+            return None
+        # Relative path when possible
+        relative_path = PathMachine.getRelativePath(self._packRelativePath, path)
+        if relative_path is not None:
+            path = relative_path
+        # Repair broken path, as planned for the target
+        path = PathMachine.repairPath(path, target)
+        # If the path had no extension
+        if not Path(value).suffix:
+            path = Path(path).with_suffix("")
+        return str(path)
+
+    # Changed spans
+    def getResolved(self) -> List[Tuple[int, int, str]]:
+        return self._replacements
+
+    # Set the changed spans
+    def setResolved(self, resolved: List[Tuple[int, int, str]]):
+        self._replacements = resolved
+
+    # Rewrite the file
+    def rewrite(self):
+        # Only the files with changed spans
+        content = self.render()
+        if content is None:
+            return
+        display("Rewriting JSON file: %s", self.path, level="info")
+        with open(self.path, "wb") as f:
+            f.write(content)
+
+    # Render the file
+    def render(self) -> bytes:
+        """Replace the changed string spans in the content of the file
+
+        Returns:
+            bytes: The content of the file, None if unchanged
+        """
+        # Unchanged file
+        if not self._replacements:
+            return None
+        # Keep the byte order mark
+        content = PathMachine.readFile(self._packRelativePath)
+        bom = content.startswith(b"\xef\xbb\xbf")
+        text = content.decode("utf-8-sig")
+        # Join the unchanged parts and the new spans
+        parts, position = [], 0
+        for start, end, new in sorted(self._replacements):
+            parts.append(text[position:start])
+            parts.append(new)
+            position = end
+        parts.append(text[position:])
+        return (b"\xef\xbb\xbf" if bom else b"") + "".join(parts).encode("utf-8")
+
+class CemFile(JsonFile):
+    """OptiFine CEM model (.jem) or part (.jpm), its references are paths unless they are namespaced"""
+
+    __slots__ = ()
+
+    # Verify if a value is a namespaced id
+    def isId(self, value: str) -> bool:
+        return ":" in value
 
 file_type_table = {
-    ".properties": PropertyFile
+    ".properties": PropertyFile,
+    ".json": JsonFile,
+    ".mcmeta": JsonFile,
+    ".jem": CemFile,
+    ".jpm": CemFile,
 }
 
 # Function that generates all the files recursively
@@ -243,10 +558,92 @@ def generateFiles():
     # Loop through all the files recursively from the root path
     for path in PathMachine.getOriginalTree():
         # If the path is a file
-        if PathMachine.transformPathToSystemPath(path).is_file():
+        if PathMachine.isFile(path):
             # Get the extension
             extension = path.suffix
             # If the extension is in the file type table
             if extension in file_type_table.keys():
                 # Create the file object
                 file_type_table[extension](path)
+
+# Restore the path machine and the log levels in an analysis worker
+def _initAnalysisWorker(state: dict, thresholds: tuple):
+    PathMachine.setState(state)
+    setLevels(thresholds)
+
+# Handle the references of a file, capturing its records, its references and its reference kind counters
+def _handleReferences(file: File) -> tuple:
+    # Forget the references of a previous analysis
+    PathMachine.clearReferences(file._packRelativePath)
+    with capture() as records, RunStats.capture() as counters:
+        file.handleReferences()
+    # The reference kinds are counted when the result is applied, so they are counted for the cached results too
+    kinds = {name: n for name, n in counters.items() if name.startswith("references.")}
+    RunStats.merge({name: n for name, n in counters.items() if name not in kinds})
+    return file.getResolved(), records, PathMachine.getReferences(file._packRelativePath), kinds
+
+# Handle the references of a chunk of files in an analysis worker
+def _handleReferencesChunk(files: List[File]) -> tuple:
+    # Resolved properties, records and references of each file, and the counters of the chunk
+    with RunStats.capture() as counters:
+        results = [_handleReferences(file) for file in files]
+    return results, counters
+
+# Get the results of a chunk, adding up its counters
+def _chunkResults(future) -> list:
+    results, counters = future.result()
+    RunStats.merge(counters)
+    return results
+
+# Function that handles the references of all the files
+def analyseReferences(files: List[File], jobs: int = 1, progress: Callable[[int], None] = None):
+    """Handle the references of all the files, in parallel if more than one job
+
+    Files unchanged since a previous run are taken from the reference cache.
+    The references of each file are added to the reference graph of the PathMachine.
+    The results and the log are the same with any number of jobs, a cached resolution logs the
+    records of the first one.
+
+    Args:
+        files (List[File]): The files, in analysis order
+        jobs (int, optional): The number of worker processes, 0 for the CPU count. Defaults to 1.
+        progress (Callable[[int], None], optional): Called with the number of handled files. Defaults to None.
+    """
+    # Worker count
+    jobs = jobs or os.cpu_count() or 1
+    # Results of the files found in the cache, the tree is only hashed when the cache is enabled
+    fingerprint = ReferenceCache.fingerprint(PathMachine.getIndex(), config.PROPERTY_CONFIG, PathMachine.replaceable_pathroot) if ReferenceCache.isEnabled() else None
+    cached = [ReferenceCache.getReferences(file._packRelativePath, getattr(file, "_contentHash", None), fingerprint) for file in files]
+    missing = [file for file, result in zip(files, cached) if result is None]
+    # Handle the references of the missing files serially
+    if jobs == 1 or len(missing) < 2:
+        _applyReferences(files, cached, (_handleReferences(file) for file in missing), fingerprint, progress)
+        return
+    # Split the files in chunks, a few per worker to balance the load
+    chunksize = max(len(missing) // (jobs * 4), 1)
+    chunks = [missing[i:i + chunksize] for i in range(0, len(missing), chunksize)]
+    # Handle the chunks with the workers, the tree is sent once per worker
+    from concurrent.futures import ProcessPoolExecutor
+    flush()
+    with ProcessPoolExecutor(min(jobs, len(chunks)), initializer=_initAnalysisWorker, initargs=(PathMachine.getState(), getLevels())) as exe:
+        futures = [exe.submit(_handleReferencesChunk, chunk) for chunk in chunks]
+        _applyReferences(files, cached, (result for future in futures for result in _chunkResults(future)), fingerprint, progress)
+
+# Apply the results of the analysis in the original order
+def _applyReferences(files: List[File], cached: list, computed, fingerprint: str, progress: Callable[[int], None] = None):
+    # For each file
+    for file, result in zip(files, cached):
+        # Take the next computed result and save it for the next runs
+        if result is None:
+            result = next(computed)
+            ReferenceCache.setReferences(file._packRelativePath, getattr(file, "_contentHash", None), fingerprint, *result)
+        # Emit the records, count the reference kinds, set the resolved references and add them to the graph
+        resolved, records, references, kinds = result
+        replay(records)
+        RunStats.merge(kinds)
+        if resolved is not None:
+            file.setResolved(resolved)
+        PathMachine.setReferences(file._packRelativePath, references)
+        # Report the progress
+        if progress:
+            progress(1)
@@ -0,0 +1,75 @@
+from contextlib import contextmanager
+import globvar
+from FileTypes import File
+from PackPath import PackPath
+from PathMachine import PathMachine
+from RunStats import RunStats
+
+# State of one resource pack, installed in the global state while the pack is handled
+class PackContext:
+
+    def __init__(self, path: str, in_memory: bool = False, jobs: int = 1, extract_workers: int = 0):
+        """Create the context of a resource pack
+
+        Args:
+            path (str): The resource pack archive
+            in_memory (bool, optional): Work from the archive without extracting it. Defaults to False.
+            jobs (int, optional): The number of processes analysing the references. Defaults to 1.
+            extract_workers (int, optional): The number of processes extracting the archive, 0 for the CPU count. Defaults to 0.
+        """
+
+        # Pack and options
+        self.path = path.replace("\\", "/")
+        self.name = self.path.split("/")[-1]
+        self.in_memory = in_memory
+        self.jobs = jobs
+        self.extract_workers = extract_workers
+
+        # Saved global state (None until the context is first activated)
+        self._state: dict = None
+
+    # Save the global state
+    @staticmethod
+    def _saveState() -> dict:
+        return {
+            "root_path": globvar.root_path,
+            "paths": PackPath.getState(),
+            "path_machine": PathMachine.getState(full=True),
+            "files": File.file_dict,
+            "stats": RunStats.getState(),
+        }
+
+    # Restore the global state
+    @staticmethod
+    def _restoreState(state: dict):
+        globvar.root_path = state["root_path"]
+        PackPath.setState(state["paths"])
+        PathMachine.setState(state["path_machine"])
+        File.file_dict = state["files"]
+        RunStats.setState(state["stats"])
+
+    # Install the context in the global state
+    @contextmanager
+    def activate(self):
+        """Install the pack state in PathMachine, PackPath, File, globvar and RunStats, and save it back on exit
+
+        Yields:
+            PackContext: The context
+        """
+        # Save the state of the previous context
+        previous = self._saveState()
+        # Install this context, empty the first time
+        if self._state is None:
+            globvar.root_path = None
+            PackPath.reset()
+            PathMachine.reset()
+            File.file_dict = {}
+            RunStats.reset()
+        else:
+            self._restoreState(self._state)
+        try:
+            yield self
+        finally:
+            # Save this context and restore the previous one
+            self._state = self._saveState()
+            self._restoreState(previous)
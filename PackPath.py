@@ -0,0 +1,90 @@
+from pathlib import PurePosixPath
+from typing import Dict, Iterable
+import posixpath
+
+# Interned path of the pack, normalized without the host filesystem
+class PackPath(PurePosixPath):
+
+    ### Privates properties ###
+
+    # Interned paths by normalized path
+    _interned: Dict[str, "PackPath"] = {}
+
+    ### Construction ###
+
+    # Normalize a pack path
+    @staticmethod
+    def normalize(path) -> str:
+        """Normalize a pack path lexically ("." and ".." segments, repeated slashes)
+
+        Args:
+            path (str | PurePath): The path to normalize
+
+        Returns:
+            str: The normalized path
+        """
+        # Collapse the segments
+        path = posixpath.normpath(str(path))
+        # normpath keeps two leading slashes
+        if path.startswith("//"):
+            path = "/" + path.lstrip("/")
+        return path
+
+    # Get the interned pack path of a path
+    @classmethod
+    def of(cls, path) -> "PackPath":
+        """Get the normalized and interned pack path of a path
+
+        Args:
+            path (str | PurePath): The path
+
+        Returns:
+            PackPath: The interned pack path
+        """
+        # Already interned
+        if type(path) is cls and cls._interned.get(str(path)) is path:
+            return path
+        # Normalize and intern the path
+        key = cls.normalize(path)
+        interned = cls._interned.get(key)
+        if interned is None:
+            interned = cls._interned[key] = cls(key)
+        return interned
+
+    ### State ###
+
+    # Get the interned paths, to restore them with the pack they belong to
+    @classmethod
+    def getState(cls) -> Dict[str, "PackPath"]:
+        return cls._interned
+
+    # Restore the interned paths
+    @classmethod
+    def setState(cls, interned: Dict[str, "PackPath"]):
+        cls._interned = interned
+
+    # Forget the interned paths
+    @classmethod
+    def reset(cls, kept: Iterable["PackPath"] = ()):
+        """Forget the interned paths, except the given ones
+
+        The forgotten paths are interned again when used, as other instances equal to the previous ones.
+
+        Args:
+            kept (Iterable[PackPath], optional): The interned paths still in use. Defaults to ().
+        """
+        # A new table, the previous one may be saved by a pack context
+        cls._interned = {str(path): path for path in kept}
+
+    ### Comparison ###
+
+    # Interned paths are compared by identity first
+    def __eq__(self, other):
+        return self is other or super().__eq__(other)
+
+    # Keep the path hash (defining __eq__ removes it)
+    __hash__ = PurePosixPath.__hash__
+
+    # Intern the path again when unpickled (in the workers)
+    def __reduce__(self):
+        return (PackPath.of, (str(self),))
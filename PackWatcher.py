@@ -0,0 +1,358 @@
+from pathlib import Path
+from typing import Dict, List, Set
+import json
+import queue
+import sys
+import threading
+import time
+import mylog
+from FileTypes import File, analyseReferences, file_type_table
+from PathMachine import PathMachine
+from PackPath import PackPath
+from RunStats import RunStats
+from config import config
+
+# Analysis of an unpacked resource pack kept up to date, answering queries about it
+class PackWatcher:
+
+    def __init__(self, interval: float = 1.0, port: int = None):
+        """Watch the resource pack installed in PathMachine and File, once analysed
+
+        The root path is scanned periodically, only the changed files and the files whose references
+        may resolve differently are analysed again. The queries are JSON lines read from the standard
+        input, and from a local socket when a port is given, each answered by a JSON line.
+
+        Args:
+            interval (float, optional): Seconds between two scans of the root path. Defaults to 1.0.
+            port (int, optional): Local TCP port answering the queries too (0 for any free port), None for the standard input only. Defaults to None.
+        """
+
+        # Options
+        self.interval = interval
+        self.port = port
+
+        # Queries as (line, reply), put by the input threads and answered by the watching thread only
+        self._requests = queue.SimpleQueue()
+
+        # Contents of the analysed files, read when looking for the files mentioning an added path
+        self._contents: Dict[str, bytes] = {}
+
+        # Orphaned files of the current tree (None until queried)
+        self._orphans: List[Path] = None
+
+        # Number of updates, time and summary of the last one
+        self.updates = 0
+        self.updated = time.time()
+        self.last: dict = None
+
+        # Listening socket (None without port)
+        self._server = None
+        self._running = False
+
+    ### Watch ###
+
+    # Watch until stopped
+    def run(self):
+        """Answer the queries and scan the root path until the stop query, the end of the standard input (without socket) or an interruption
+        """
+        self._running = True
+        # Read the queries
+        threading.Thread(target=self._readInput, daemon=True).start()
+        if self.port is not None:
+            self._startServer()
+        mylog.display("Watching %s, scanned every %.1fs", PathMachine.getRootPath(), self.interval)
+        # Next scan
+        scan = time.monotonic() + self.interval
+        try:
+            while self._running:
+                # Scan the root path when due, even when the queries keep coming
+                if time.monotonic() >= scan:
+                    self.update()
+                    scan = time.monotonic() + self.interval
+                # Wait for a query until the next scan
+                try:
+                    line, reply = self._requests.get(timeout=max(scan - time.monotonic(), 0))
+                except queue.Empty:
+                    continue
+                # End of the standard input, the socket keeps answering
+                if line is None:
+                    self._running = self._server is not None
+                    continue
+                reply(json.dumps(self.answer(line)))
+        except KeyboardInterrupt:
+            mylog.display("Interrupted")
+        finally:
+            self._stopServer()
+        mylog.display("Stopped watching after %d updates", self.updates)
+
+    # Scan the root path and analyse the affected files again
+    def update(self) -> dict:
+        """Scan the root path and analyse again the files affected by the changes
+
+        Returns:
+            dict: The summary of the update, None without change
+        """
+        try:
+            with RunStats.stage("watch") as stage:
+                summary = self._update()
+                if summary is not None:
+                    stage["items"] = (stage["items"] or 0) + len(summary["analysed"])
+        except OSError as e:
+            # The pack is changing while scanned, the next scan will see it
+            mylog.display("Failed to update the pack: %s", e, level="error")
+            return None
+        if summary is None:
+            return None
+        self.updates += 1
+        self.updated = time.time()
+        self.last = summary
+        self._orphans = None
+        mylog.display("Updated %d added, %d removed and %d modified paths, %d files analysed in %.1fms", summary["added"], summary["removed"], summary["modified"], len(summary["analysed"]), summary["time"] * 1000)
+        return summary
+
+    # Scan the root path and analyse the affected files again
+    def _update(self) -> dict:
+        # Compare the tree with the metadata of the previous scan
+        start = time.perf_counter()
+        index = PathMachine.getIndex()
+        tree, entries = PathMachine.generateTree()
+        added, removed, modified = [], [], []
+        current = set()
+        for path, entry in zip(tree, entries):
+            current.add(str(path))
+            previous = index.entry(path)
+            # A path changing between file and directory is removed and added
+            if previous is not None and previous.is_dir != entry.is_dir:
+                removed.append(path)
+            if previous is None or previous.is_dir != entry.is_dir:
+                added.append(path)
+            elif not entry.is_dir and (previous.size, previous.mtime) != (entry.size, entry.mtime):
+                modified.append(path)
+        removed.extend(path for path in PathMachine.getOriginalTree() if str(path) not in current)
+        if not (added or removed or modified):
+            return None
+
+        # The changed files are analysed again
+        analysed: Set[str] = {str(path) for path in added + modified}
+        for path in modified:
+            self._contents.pop(str(path), None)
+        # The referrers of a removed path resolve it differently, the removed files are forgotten
+        for path in removed:
+            analysed.update(PathMachine.getReferrers(path))
+            File.file_dict.pop(str(path), None)
+            PathMachine.clearReferences(path)
+            self._contents.pop(str(path), None)
+
+        # Index the new tree and plan it again
+        plan = PathMachine.getPlan()
+        PathMachine.updateTree(tree, entries)
+        if added or removed:
+            # The referrers of a path planned differently repair it differently
+            new_plan = PathMachine.getPlan()
+            for path in {original for original, _ in plan.targets()} | {original for original, _ in new_plan.targets()}:
+                if plan.target(path) != new_plan.target(path):
+                    analysed.update(PathMachine.getReferrers(path))
+            # A reference can only resolve to an added file if it mentions its stem
+            analysed.update(self.mentioning({path.stem for path in added if PathMachine.isFile(path)}))
+
+        # Analyse the files again, from their current content
+        files = []
+        for path in sorted(analysed):
+            path = PackPath.of(path)
+            if not PathMachine.isFile(path) or path.suffix not in file_type_table:
+                continue
+            try:
+                files.append(file_type_table[path.suffix](path))
+            except OSError as e:
+                mylog.display("Failed to read %s: %s", path, e, level="warning")
+        analyseReferences(files)
+        return {
+            "added": len(added),
+            "removed": len(removed),
+            "modified": len(modified),
+            "analysed": [str(file._packRelativePath) for file in files],
+            "time": time.perf_counter() - start,
+        }
+
+    # Get the analysed files mentioning a stem
+    def mentioning(self, stems: Set[str]) -> Set[str]:
+        """Get the analysed files whose content contains one of the stems
+
+        A reference resolved directly or through the stem index always contains the stem of its target,
+        so only these files may resolve a reference to an added file.
+
+        Args:
+            stems (Set[str]): The stems of the added files
+
+        Returns:
+            Set[str]: The PathMachine absolute paths of the files
+        """
+        # The stems as written in UTF-8 (JSON) and ISO-8859-1 (properties) files
+        needles = set()
+        for stem in filter(None, stems):
+            needles.add(stem.encode("utf-8"))
+            needles.add(stem.encode("ISO-8859-1", errors="replace"))
+        if not needles:
+            return set()
+        # Search the contents, read once until modified
+        found = set()
+        for path in File.file_dict:
+            content = self._contents.get(path)
+            if content is None:
+                try:
+                    content = self._contents[path] = PathMachine.readFile(PackPath.of(path))
+                except OSError:
+                    continue
+            if any(needle in content for needle in needles):
+                found.add(path)
+        return found
+
+    # Get the orphaned files of the current tree
+    def orphans(self) -> List[Path]:
+        # Found again after each update
+        if self._orphans is None:
+            self._orphans = PathMachine.getOrphans(config.ORPHAN_CONFIG)
+        return self._orphans
+
+    ### Queries ###
+
+    # Answer a query
+    def answer(self, line: str) -> dict:
+        """Answer a query
+
+        Args:
+            line (str): A JSON object as {"query": "referrers", "path": "/assets/...", "id": 1}, or the query name followed by the path
+
+        Returns:
+            dict: The answer as {"id": 1, "result": ...} or {"id": 1, "error": "..."}, with the id of the query if any
+        """
+        # Parse the query
+        try:
+            request = json.loads(line) if line.lstrip().startswith("{") else dict(zip(("query", "path"), line.split(None, 1)))
+        except json.JSONDecodeError as e:
+            return {"error": f"Invalid query: {e}"}
+        answer = {"id": request["id"]} if "id" in request else {}
+        # Find the query
+        query = self.queries.get(request.get("query"))
+        if query is None:
+            answer["error"] = f"Unknown query: {request.get('query')}, expected one of {', '.join(self.queries)}"
+            return answer
+        # Answer it
+        try:
+            answer["result"] = query(self, request)
+        except (KeyError, ValueError) as e:
+            answer["error"] = f"Invalid query: {e}"
+        return answer
+
+    # Get the PathMachine absolute path of a query
+    @staticmethod
+    def queryPath(request: dict) -> Path:
+        # Relative to the root of the pack
+        if not request.get("path"):
+            raise ValueError("the path is missing")
+        return PackPath.of("/" + str(request["path"]).strip().replace("\\", "/").strip("/"))
+
+    # State of the pack
+    def status(self, request: dict) -> dict:
+        plan = PathMachine.getPlan()
+        return {
+            "root": str(PathMachine.getRootPath()),
+            "paths": len(PathMachine.getOriginalTree()),
+            "files": len(File.file_dict),
+            "references": PathMachine.countReferences(),
+            "broken": len(plan.renames),
+            "collisions": len(plan.collisions),
+            "orphans": len(self.orphans()),
+            "updates": self.updates,
+            "updated": self.updated,
+            "last": self.last,
+        }
+
+    # Broken paths and their planned repair
+    def broken(self, request: dict) -> List[dict]:
+        plan = PathMachine.getPlan()
+        used = {str(original): str(repaired) for original, repaired in plan.collisions}
+        return [{"path": str(original), "repaired": str(new), **({"used": used[str(original)]} if str(original) in used else {})} for original, current, new in plan.renames]
+
+    # Orphaned files
+    def orphaned(self, request: dict) -> List[str]:
+        return [str(path) for path in self.orphans()]
+
+    # References of a file
+    def references(self, request: dict) -> Dict[str, str]:
+        return PathMachine.getReferences(self.queryPath(request))
+
+    # Referrers of a path
+    def referrers(self, request: dict) -> List[str]:
+        return PathMachine.getReferrers(self.queryPath(request))
+
+    # Scan the root path now
+    def refresh(self, request: dict) -> dict:
+        return self.update()
+
+    # Stop watching
+    def stop(self, request: dict) -> bool:
+        self._running = False
+        return True
+
+    # Queries by name
+    queries = {
+        "status": status,
+        "broken": broken,
+        "orphans": orphaned,
+        "references": references,
+        "referrers": referrers,
+        "refresh": refresh,
+        "stop": stop,
+    }
+
+    ### Inputs ###
+
+    # Read the queries of the standard input
+    def _readInput(self):
+        for line in sys.stdin:
+            if line.strip():
+                self._requests.put((line, self._print))
+        # End of the input
+        self._requests.put((None, None))
+
+    # Write an answer to the standard output
+    @staticmethod
+    def _print(text: str):
+        sys.stdout.write(text + "\n")
+        sys.stdout.flush()
+
+    # Listen on the local socket
+    def _startServer(self):
+        import socket
+        self._server = socket.create_server(("127.0.0.1", self.port))
+        mylog.display("Answering queries on 127.0.0.1:%d", self._server.getsockname()[1])
+        threading.Thread(target=self._accept, daemon=True).start()
+
+    # Accept the connections until the socket is closed
+    def _accept(self):
+        while True:
+            try:
+                connection, _ = self._server.accept()
+            except OSError:
+                return
+            threading.Thread(target=self._serve, args=(connection,), daemon=True).start()
+
+    # Answer the queries of a connection, one line each
+    def _serve(self, connection):
+        answers = queue.SimpleQueue()
+        try:
+            with connection, connection.makefile("rb") as lines:
+                for line in lines:
+                    if not line.strip():
+                        continue
+                    self._requests.put((line.decode("utf-8", errors="replace"), answers.put))
+                    connection.sendall(answers.get().encode("utf-8") + b"\n")
+        except OSError:
+            pass
+
+    # Close the local socket
+    def _stopServer(self):
+        if self._server is not None:
+            self._server.close()
+            self._server = None
@@ -1,10 +1,17 @@
 from pathlib import Path
 import re
 import globvar
-from typing import List
-from mylog import display
+from typing import BinaryIO, Dict, List, Set, Tuple
+from zipfile import ZipFile, ZipInfo
+from mylog import display, capture, replay
 from broken_path import repair_path
+from TreeIndex import TreeIndex, TreeEntry
+from PackPath import PackPath
+from RenamePlan import RenamePlan
+from RunStats import RunStats
+import json
 import os
+import time
 
 # Non instantiable class to handle all the path related stuff
 class PathMachine:
@@ -15,10 +22,37 @@ class PathMachine:
     _root_path: Path = None
 
     # Original tree
-    _original_tree: List[Path]
+    _original_tree: List[Path] = []
 
     # Modified tree
-    _modified_tree: List[Path]
+    _modified_tree: List[Path] = []
+
+    # Index of the original tree
+    _index: TreeIndex = None
+
+    # Original path to modified path
+    _modified_map: Dict[Path, Path] = {}
+
+    # Archive the tree is read from (None when read from the extract directory)
+    _archive: ZipFile = None
+
+    # Archive members by path (None when read from the extract directory)
+    _archive_members: Dict[str, ZipInfo] = None
+
+    # Resolved paths, resolution kinds and logged records by raw value, context directory and expected extensions
+    _resolved: Dict[tuple, Tuple[Path, str, list]] = {}
+
+    # Resolution kinds by referenced path, by referencing file
+    _references: Dict[str, Dict[str, str]] = {}
+
+    # Referencing files by referenced path
+    _referrers: Dict[str, Set[str]] = {}
+
+    # Referencing files of the renamed paths, to rewrite
+    _affected: Set[str] = set()
+
+    # Renames repairing the broken names (None until planned)
+    _plan: RenamePlan = None
 
     # Dictionary of replaceable pathroot
     replaceable_pathroot = {
@@ -29,21 +63,35 @@ class PathMachine:
 
     # Init path machine
     @classmethod
-    def init(cls, root_path: Path):
+    def init(cls, root_path: Path, archive: ZipFile = None):
         """Init the path machine
 
         Args:
             root_path (Path): The root path
+            archive (ZipFile, optional): The archive to read the tree from instead of the root path. Defaults to None.
         """
 
         # Set the root path
         cls._root_path = root_path
 
+        # Set the archive
+        cls._archive = archive
+        cls._archive_members = None
+
         # Generate original tree
-        cls._original_tree = cls.generateTree()
+        cls._original_tree, entries = cls.generateArchiveTree() if archive else cls.generateTree()
+
+        # Index the original tree
+        cls._index = TreeIndex(cls._original_tree, entries)
 
         # Init modified tree
         cls._modified_tree = cls._original_tree.copy()
+        cls._modified_map = {}
+        cls._plan = None
+
+        # Reset the resolution cache and the reference graph
+        cls.clearResolved()
+        cls.clearGraph()
 
     # Update modified tree
     @classmethod
@@ -56,18 +104,200 @@ class PathMachine:
         """
 
         # Get the index of the original path
-        index = cls._original_tree.index(original_path)
+        index = cls._index.position(original_path)
 
         # Update the modified tree
         cls._modified_tree[index] = modified_path
+        cls._modified_map[cls._original_tree[index]] = modified_path
+
+        # The files referencing a renamed path have to be rewritten
+        if modified_path != cls._original_tree[index]:
+            cls._affected.update(cls._referrers.get(str(cls._original_tree[index]), ()))
+
+        # Resolutions made on the previous tree are no longer valid
+        cls._resolved.clear()
 
     # Generate the tree
     @classmethod
     def generateTree(cls):
-        """Generate the tree and return it
+        """Generate the tree with a single scan of the root path and return it with the metadata of each path
+        """
+
+        # Tree and metadata
+        tree = []
+        entries = []
+
+        # Scan a directory, then its sub directories (same order as rglob)
+        def scan(directory: str, prefix: str):
+            # List the directory
+            with os.scandir(directory) as it:
+                children = list(it)
+            # Add the children
+            sub_directories = []
+            for child in children:
+                # Broken symbolic links and entries removed meanwhile are left out of the tree
+                try:
+                    stat = child.stat()
+                except OSError as e:
+                    display("Skipping %s: %s", prefix + child.name, e, level="debug")
+                    continue
+                is_dir = child.is_dir()
+                tree.append(PackPath.of(prefix + child.name))
+                entries.append(TreeEntry(is_dir, stat.st_size, stat.st_mtime))
+                # Symbolic links to directories are not followed
+                if is_dir and not child.is_symlink():
+                    sub_directories.append(child)
+            # Scan the sub directories
+            for child in sub_directories:
+                scan(child.path, prefix + child.name + "/")
+
+        # Scan from the root path
+        scan(str(cls._root_path), "/")
+
+        # Return the tree
+        return tree, entries
+
+    # Generate the tree from the archive
+    @classmethod
+    def generateArchiveTree(cls):
+        """Generate the tree from the archive members and return it with the metadata of each path
+        """
+
+        # Tree, metadata, members and directories
+        tree = []
+        entries = []
+        cls._archive_members = {}
+        directories = set()
+
+        # For each member
+        for zinfo in cls._archive.infolist():
+            # Build the path and the metadata
+            path = PackPath.of("/" + zinfo.filename.replace("\\", "/").strip("/"))
+            mtime = time.mktime(zinfo.date_time + (0, 0, -1))
+            # Add the implicit parent directories first
+            for parent in reversed(path.parents[:-1]):
+                if str(parent) not in directories:
+                    directories.add(str(parent))
+                    tree.append(PackPath.of(parent))
+                    entries.append(TreeEntry(True, 0, mtime))
+            # Add the member
+            if zinfo.is_dir():
+                if str(path) not in directories:
+                    directories.add(str(path))
+                    tree.append(path)
+                    entries.append(TreeEntry(True, 0, mtime))
+            elif str(path) not in cls._archive_members:
+                cls._archive_members[str(path)] = zinfo
+                tree.append(path)
+                entries.append(TreeEntry(False, zinfo.file_size, mtime))
+
+        # Return the tree
+        return tree, entries
+
+    # Get the state of the path machine
+    @classmethod
+    def getState(cls, full: bool = False) -> dict:
+        """Get the state of the path machine, to restore it in another process
+
+        Args:
+            full (bool, optional): Include the archive, the resolution cache and the reference graph, to restore them in the same process. Defaults to False.
+
+        Returns:
+            dict: The state
+        """
+        state = {
+            "root_path": cls._root_path,
+            "original_tree": cls._original_tree,
+            "modified_tree": cls._modified_tree,
+            "index": cls._index,
+            "modified_map": cls._modified_map,
+            "archive_members": cls._archive_members,
+            "archive_path": cls._archive.filename if cls._archive else None,
+            "plan": cls._plan
+        }
+        # Not picklable or only valid in this process
+        if full:
+            state["archive"] = cls._archive
+            state["resolved"] = cls._resolved
+            state["references"] = cls._references
+            state["referrers"] = cls._referrers
+            state["affected"] = cls._affected
+        return state
+
+    # Restore the state of the path machine
+    @classmethod
+    def setState(cls, state: dict):
+        """Restore the state of the path machine
+
+        Args:
+            state (dict): The state given by getState
+        """
+        cls._root_path = state["root_path"]
+        cls._original_tree = state["original_tree"]
+        cls._modified_tree = state["modified_tree"]
+        cls._index = state["index"]
+        cls._modified_map = state["modified_map"]
+        # The archive itself in the same process, else opened again from its path
+        if "archive" in state:
+            cls._archive = state["archive"]
+        else:
+            cls._archive = ZipFile(state["archive_path"]) if state.get("archive_path") else None
+        cls._archive_members = state["archive_members"]
+        cls._plan = state.get("plan")
+        cls.clearResolved()
+        cls._resolved = state.get("resolved", cls._resolved)
+        cls.clearGraph()
+        cls._references = state.get("references", cls._references)
+        cls._referrers = state.get("referrers", cls._referrers)
+        cls._affected = state.get("affected", cls._affected)
+
+    # Close the archive the tree is read from
+    @classmethod
+    def closeArchive(cls):
+        # Nothing to do when read from the extract directory
+        if cls._archive is not None:
+            cls._archive.close()
+            cls._archive = None
+
+    # Replace the tree, keeping the reference graph
+    @classmethod
+    def updateTree(cls, tree: List[Path], entries: List[TreeEntry]):
+        """Replace the tree after changes in the root path, the reference graph is kept for the files not analysed again
+
+        Args:
+            tree (List[Path]): The new tree
+            entries (List[TreeEntry]): The metadata of each path
         """
-        return [Path(str(path).replace('\\', "/").replace(str(cls._root_path), "")) for path in cls._root_path.rglob("*")]
-    
+
+        # Only the paths of the new tree stay interned, the paths used before are not kept forever
+        PackPath.reset(tree)
+
+        # Index the new tree
+        cls._original_tree = tree
+        cls._index = TreeIndex(tree, entries)
+
+        # Nothing is renamed yet
+        cls._modified_tree = tree.copy()
+        cls._modified_map = {}
+        cls._affected = set()
+
+        # Resolutions made on the previous tree are no longer valid, the plan depends on the tree
+        cls.clearResolved()
+        cls.planRenames()
+
+    # Forget the tree
+    @classmethod
+    def reset(cls):
+        # Empty state
+        cls.setState({
+            "root_path": None,
+            "original_tree": [],
+            "modified_tree": [],
+            "index": None,
+            "modified_map": {},
+            "archive_members": None
+        })
+
     ### All setters ###
 
     # Set the root path
@@ -96,6 +326,79 @@ class PathMachine:
         # Return the modified tree
         return cls._modified_tree
 
+    # Get the modified path of an original path
+    @classmethod
+    def getModifiedPath(cls, original_path: Path) -> Path:
+        # Return the modified path, or the original one if not modified
+        return cls._modified_map.get(original_path, original_path)
+
+    # Get the index of the original tree
+    @classmethod
+    def getIndex(cls) -> TreeIndex:
+        # Return the index
+        return cls._index
+
+    ### Files actions ###
+
+    # Verify if a path is a file
+    @classmethod
+    def isFile(cls, path: Path) -> bool:
+        # From the tree metadata
+        entry = cls._index.entry(path)
+        return entry is not None and not entry.is_dir
+
+    # Verify if a path is a directory
+    @classmethod
+    def isDir(cls, path: Path) -> bool:
+        # The root is a directory
+        if str(path) == "/":
+            return True
+        # Else from the tree metadata
+        entry = cls._index.entry(path)
+        return entry is not None and entry.is_dir
+
+    # Get the archive member of a file
+    @classmethod
+    def getArchiveMember(cls, path: Path) -> ZipInfo:
+        # Return the member
+        return cls._archive_members[str(path)]
+
+    # Open a file for binary reading
+    @classmethod
+    def openFile(cls, path: Path) -> BinaryIO:
+        """Open a file for binary reading
+
+        Args:
+            path (Path): The PathMachine absolute path of the file
+
+        Returns:
+            BinaryIO: The opened file
+        """
+
+        # From the archive
+        if cls._archive:
+            return cls._archive.open(cls.getArchiveMember(path))
+        # Else from the system
+        return open(cls.transformPathToSystemPath(path), "rb")
+
+    # Read the content of a file
+    @classmethod
+    def readFile(cls, path: Path) -> bytes:
+        """Read the content of a file
+
+        Args:
+            path (Path): The PathMachine absolute path of the file
+
+        Returns:
+            bytes: The content of the file
+        """
+
+        # From the archive
+        if cls._archive:
+            return cls._archive.read(cls.getArchiveMember(path))
+        # Else from the system
+        return cls.transformPathToSystemPath(path).read_bytes()
+
     ### Paths actions ###
 
     # Transform PathMachine absolute path to System absolute path
@@ -158,17 +461,13 @@ class PathMachine:
         if not path.is_absolute():
             raise ValueError("The path must be absolute")
 
-        # Validate the path from original list and return it
-        if path in cls._original_tree:
+        # Validate the path from original index and return it
+        if path in cls._index:
             return path
         # Else if no suffix, and expected extensions is not empty
         elif path.suffix == "" and expected_extensions != []:
-            # For each expected extension
-            for extension in expected_extensions:
-                # If the path exists
-                if (path.with_suffix(extension) in cls._original_tree):
-                    # Return the path with the extension
-                    return path.with_suffix(extension)
+            # Return the path with the first existing expected extension
+            return cls._index.withExtensions(path, expected_extensions)
         # Else return none
         else:
             return None
@@ -191,15 +490,15 @@ class PathMachine:
             raise ValueError("The directory must be absolute")
 
         # Directory should be a directory
-        if not cls.transformPathToSystemPath(directory).is_dir():
+        if not cls.isDir(directory):
             raise ValueError("The directory must be a directory")
 
         # Relative path should be a relative path
         if relativePath.is_absolute():
             raise ValueError("The relative path must be relative")
 
-        # Build the path
-        newPath = (directory / relativePath).resolve()
+        # Build the path (normalized without the host filesystem)
+        newPath = PackPath.of(directory / relativePath)
 
         # Validate the path
         return cls.validateAbsolutePath(newPath, expected_extensions)
@@ -223,16 +522,12 @@ class PathMachine:
         # Path part to search
         pathPart = str(path)
 
-        # Get list of all the paths that contains the path part in original tree
-        paths = [p for p in cls._original_tree if pathPart in str(p)]
+        # Get the paths that can be the final target from the index
+        # Path is not the final target if it's stem is not contained in the path stem
+        paths = cls._index.byStemWithin(path.stem)
 
-        # If no paths found
-        if len(paths) == 0:
-            return None
-
-        # Remove all the paths that are not the final target
-        # Path is not the final target if it's stem is not equal to the path stem
-        paths = [p for p in paths if p.stem in path.stem]
+        # Keep only the paths that contains the path part
+        paths = [p for p in paths if pathPart in str(p)]
 
         # If no paths found
         if len(paths) == 0:
@@ -249,12 +544,12 @@ class PathMachine:
 
         # Verify if all the paths have the same parent
         if not all([p.parent == paths[0].parent for p in paths]):
-            display("The path is ambiguous: " + str(path) + "\nMaybe it's not a path ? In that case, you can ignore this warning.\nElse, try to make it more precise so it can be identified.", "warning")
+            display("The path is ambiguous: %s\nMaybe it's not a path ? In that case, you can ignore this warning.\nElse, try to make it more precise so it can be identified.", path, level="warning")
             return None
 
         # If more than one path found
         if len(paths) > 1 and not expect_extensions:
-            display("Multiples corresponding files found: " + str(path) + "\n No file extension expected, keep trouble path.", "debug")
+            display("Multiples corresponding files found: %s\n No file extension expected, keep trouble path.", path, level="debug")
 
         # Return the first path
         return paths[0]
@@ -264,6 +559,9 @@ class PathMachine:
     def resolvePath(cls, path: Path, currentPath: Path, expected_extensions: List[str] = []) -> Path:
         """Resolve path from path and current file path
 
+        Resolutions are cached by raw value, context directory and expected extensions
+        until the tree is updated.
+
         Args:
             path (Path): The path to resolve
             currentPath (Path): The current file path
@@ -273,7 +571,45 @@ class PathMachine:
         """
 
         # Log
-        display("Resolving path: " + str(path) + " from path: " + str(currentPath), "debug")
+        display("Resolving path: %s from path: %s", path, currentPath, level="debug")
+
+        # Current path should be an absolute path
+        if not currentPath.is_absolute():
+            raise ValueError("The current path must be absolute")
+
+        # Set context
+        # If current path is a file, set the parent as context
+        # Else, set the current path as context
+        context = currentPath.parent if cls.isFile(currentPath) else currentPath
+
+        # Return the cached resolution if any
+        key = (str(path), str(context), tuple(expected_extensions))
+        if key in cls._resolved:
+            RunStats.count("resolve.hits")
+            resolved, kind, records = cls._resolved[key]
+        # Else resolve and cache the path, with its records
+        else:
+            RunStats.count("resolve.misses")
+            with capture() as records:
+                resolved, kind = cls._resolveInContext(path, context, expected_extensions)
+            cls._resolved[key] = resolved, kind, records
+        # The resolution logs the same records whether it was cached or not, so the log does not depend on the workers sharing the cache
+        replay(records)
+
+        # Count the reference by resolution kind and add it to the graph
+        RunStats.count("references." + kind)
+        if resolved is not None:
+            cls.addReference(currentPath, resolved, kind)
+        return resolved
+
+    # Resolve path from path and context directory
+    @classmethod
+    def _resolveInContext(cls, path: Path, context: Path, expected_extensions: List[str]) -> Tuple[Path, str]:
+        """Resolve path from path and context directory
+
+        Returns:
+            Tuple[Path, str]: The resolved path (None if not resolvable) and the resolution kind: "direct", "ambiguous" or "unresolved"
+        """
 
         # If path already have extension empty expected_extensions
         if path.suffix:
@@ -283,31 +619,22 @@ class PathMachine:
         for root in cls.replaceable_pathroot:
             if str(path).startswith(root):
                 path = Path(str(path).replace(root, cls.replaceable_pathroot[root]))
-                display("Path root replaced: " + str(path), "info")
-
-        # Current path should be an absolute path
-        if not currentPath.is_absolute():
-            raise ValueError("The current path must be absolute")
-
-        # Set context
-        # If current path is a file, set the parent as context
-        # Else, set the current path as context
-        context = currentPath.parent if cls.transformPathToSystemPath(currentPath).is_file() else currentPath
+                display("Path root replaced: %s", path, level="info")
 
         # If path is absolute, try to validate it
         # Path is absolute if it start with a slash
         if str(path).startswith("/"):
-            # Make the path as simple as possible
-            path = path.resolve()
+            # Make the path as simple as possible (without the host filesystem)
+            path = PackPath.of(path)
             # Validate the path
             resolved = cls.validateAbsolutePath(path, expected_extensions)
             # If path is valid, return it
             if resolved:
-                return resolved
+                return resolved, "direct"
             # Else, warn and return None
             else:
-                display("The absolute path is not valid: " + str(path), "debug")
-                return None
+                display("The absolute path is not valid: %s", path, level="debug")
+                return None, "unresolved"
 
         # If path is relative, try to resolve it
         else:
@@ -315,7 +642,7 @@ class PathMachine:
             resolved = cls.pathFromDirectoryRelative(context, path, expected_extensions)
             # If the path is resolved, return it
             if resolved:
-                return resolved
+                return resolved, "direct"
             # Else, try to resolve the ambiguous path
             else:
                 # If the path already have an extension, empty expected_extensions
@@ -325,11 +652,23 @@ class PathMachine:
                 resolved = cls.ambiguousPathResolver(path, expected_extensions)
                 # If the path is resolved, return it
                 if resolved:
-                    return resolved
+                    return resolved, "ambiguous"
                 # Else, return None
                 else:
-                    display("The path is not resolvable: " + str(path), "debug")
-                    return None
+                    display("The path is not resolvable: %s", path, level="debug")
+                    return None, "unresolved"
+
+    # Reset the resolution cache
+    @classmethod
+    def clearResolved(cls):
+        # Empty the cache
+        cls._resolved = {}
+
+    # Get the resolution cache counters
+    @classmethod
+    def getResolveStats(cls) -> Dict[str, int]:
+        # Hits and misses of the run
+        return {"hits": RunStats.getCounter("resolve.hits"), "misses": RunStats.getCounter("resolve.misses")}
 
     # Get relative path between departure path and arrival path
     @classmethod
@@ -351,7 +690,7 @@ class PathMachine:
             raise ValueError("The arrival path is not valid")
 
         # If departure path is a file, set the parent as departure path
-        if cls.transformPathToSystemPath(departurePath).is_file():
+        if cls.isFile(departurePath):
             departurePath = departurePath.parent
 
         # Get the relative path
@@ -377,6 +716,203 @@ class PathMachine:
 
     # Repair path
     @classmethod
-    def repairPath(cls, path: Path) -> Path:
-        # Return repaired path
-        return repair_path(path)
\ No newline at end of file
+    def repairPath(cls, path: Path, target: Path = None) -> Path:
+        """Repair a path, following the rename plan when there is one
+
+        Args:
+            path (Path): The path to repair, absolute or relative
+            target (Path, optional): The PathMachine absolute path the path leads to. Defaults to None.
+
+        Returns:
+            Path: The repaired path
+        """
+        # Without plan, repair each part
+        if cls._plan is None or target is None:
+            return repair_path(path)
+        # The named parts of the path are the last parts of the planned target
+        planned = cls._plan.target(target)
+        parts = Path(path).parts
+        count = len([part for part in parts if part not in ("/", ".", "..")])
+        return Path(*parts[:len(parts) - count], *planned.parts[len(planned.parts) - count:])
+
+    ### Rename plan ###
+
+    # Plan the renames of the tree
+    @classmethod
+    def planRenames(cls) -> RenamePlan:
+        """Plan the renames repairing the broken names of the original tree
+
+        Returns:
+            RenamePlan: The plan
+        """
+        # Plan and keep it for the repaired references
+        cls._plan = RenamePlan(cls._original_tree)
+        return cls._plan
+
+    # Get the rename plan
+    @classmethod
+    def getPlan(cls) -> RenamePlan:
+        # Return the plan
+        return cls._plan
+
+    # Apply the rename plan to the modified tree
+    @classmethod
+    def applyPlan(cls):
+        """Update the modified tree with the planned paths, in a single pass over the paths that change
+        """
+        # For each planned path
+        for original_path, modified_path in cls._plan.targets():
+            index = cls._index.position(original_path)
+            cls._modified_tree[index] = modified_path
+            cls._modified_map[cls._original_tree[index]] = modified_path
+            # The files referencing a renamed path have to be rewritten
+            cls._affected.update(cls._referrers.get(str(cls._original_tree[index]), ()))
+
+        # Resolutions made on the previous tree are no longer valid
+        cls._resolved.clear()
+
+    ### Reference graph ###
+
+    # Forget the reference graph
+    @classmethod
+    def clearGraph(cls):
+        # Empty the graph
+        cls._references = {}
+        cls._referrers = {}
+        cls._affected = set()
+
+    # Add a reference to the graph
+    @classmethod
+    def addReference(cls, referrer: Path, target: Path, kind: str = "direct"):
+        """Add a reference to the graph
+
+        Args:
+            referrer (Path): The PathMachine absolute path of the referencing file
+            target (Path): The PathMachine absolute path of the referenced file
+            kind (str, optional): The resolution kind, "direct" or "ambiguous". Defaults to "direct".
+        """
+        # Both directions
+        cls._references.setdefault(str(referrer), {})[str(target)] = kind
+        cls._referrers.setdefault(str(target), set()).add(str(referrer))
+
+    # Remove the references of a file from the graph
+    @classmethod
+    def clearReferences(cls, referrer: Path):
+        # Remove the reverse edges, then the file
+        for target in cls._references.pop(str(referrer), ()):
+            referrers = cls._referrers[target]
+            referrers.discard(str(referrer))
+            if not referrers:
+                del cls._referrers[target]
+
+    # Set the references of a file
+    @classmethod
+    def setReferences(cls, referrer: Path, references: Dict[str, str]):
+        """Replace the references of a file, as found by an analysis
+
+        Args:
+            referrer (Path): The PathMachine absolute path of the referencing file
+            references (Dict[str, str]): The resolution kinds by PathMachine absolute path of the referenced files
+        """
+        # Replace the previous references
+        cls.clearReferences(referrer)
+        for target, kind in references.items():
+            cls.addReference(referrer, target, kind)
+
+    # Get the references of a file
+    @classmethod
+    def getReferences(cls, referrer: Path) -> Dict[str, str]:
+        # Resolution kinds by sorted referenced path
+        return dict(sorted(cls._references.get(str(referrer), {}).items()))
+
+    # Get the referrers of a path
+    @classmethod
+    def getReferrers(cls, target: Path) -> List[str]:
+        # Sorted referencing files
+        return sorted(cls._referrers.get(str(target), ()))
+
+    # Get the number of references in the graph
+    @classmethod
+    def countReferences(cls) -> int:
+        # Edges by referencing file
+        return sum(len(references) for references in cls._references.values())
+
+    # Get the files to rewrite
+    @classmethod
+    def getAffected(cls) -> List[str]:
+        """Get the files to rewrite: the referrers of the renamed paths, and the files with ambiguous references
+
+        Returns:
+            List[str]: The sorted PathMachine absolute paths of the files
+        """
+        # An ambiguous reference is rewritten to its resolved path, even if not renamed
+        ambiguous = {referrer for referrer, references in cls._references.items() if "ambiguous" in references.values()}
+        return sorted(cls._affected | ambiguous)
+
+    # Verify if a file is used implicitly by another file of the pack
+    @classmethod
+    def isImplicitlyUsed(cls, path: Path, implicit_suffixes: List[str]) -> bool:
+        """Verify if a file is used without being referenced
+
+        A texture next to a property file of the same stem is its default texture (CIT),
+        and a texture with an implicit suffix (emissive) is used with its base texture.
+
+        Args:
+            path (Path): The PathMachine absolute path of the file
+            implicit_suffixes (List[str]): The stem suffixes of the files used with their base file
+
+        Returns:
+            bool: True if the file is used implicitly
+        """
+        # Default texture of a property file
+        if PackPath.of(path.with_suffix(".properties")) in cls._index:
+            return True
+        # Used with its base file
+        for suffix in implicit_suffixes:
+            if path.stem.endswith(suffix):
+                base = PackPath.of(path.with_name(path.stem[:-len(suffix)] + path.suffix))
+                if base in cls._index and (cls._referrers.get(str(base)) or cls.isImplicitlyUsed(base, [])):
+                    return True
+        return False
+
+    # Get the orphaned files
+    @classmethod
+    def getOrphans(cls, config) -> List[Path]:
+        """Get the files no analysed file references, their animation (.mcmeta) included
+
+        Args:
+            config (OrphanConfig): The files that can be orphans
+
+        Returns:
+            List[Path]: The orphaned files, in tree order
+        """
+        orphans = []
+        # For each candidate file without referrer
+        for path in cls._original_tree:
+            if str(path) in cls._referrers or not config.isCandidate(str(path)) or not cls.isFile(path):
+                continue
+            # Used without reference
+            if cls.isImplicitlyUsed(path, config.implicit_suffixes):
+                continue
+            # The file and its animation
+            orphans.append(path)
+            animation = PackPath.of(str(path) + ".mcmeta")
+            if animation in cls._index:
+                orphans.append(animation)
+        return orphans
+
+    # Save the reference graph
+    @classmethod
+    def saveGraph(cls, path: str):
+        """Write the reference graph as JSON
+
+        Args:
+            path (str): The graph file
+        """
+        # Both directions, sorted to compare the graphs of two runs
+        graph = {
+            "references": {referrer: dict(sorted(references.items())) for referrer, references in sorted(cls._references.items())},
+            "referrers": {target: sorted(referrers) for target, referrers in sorted(cls._referrers.items())},
+        }
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(graph, f, indent=4)
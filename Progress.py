@@ -0,0 +1,75 @@
+import threading
+import time
+import mylog
+
+# Progress of a stage, displayed periodically by a background thread
+class Progress:
+
+    # Seconds between two displays, on a terminal and on a pipe
+    tty_interval = 0.2
+    pipe_interval = 5.0
+
+    def __init__(self, label: str, total: int = None):
+        """Create the progress of a stage, use it as a context manager
+
+        Args:
+            label (str): The stage label
+            total (int, optional): The number of items, None if unknown. Defaults to None.
+        """
+        self.label = label
+        self.total = total
+        self.done = 0
+        self._start = None
+        self._stop = threading.Event()
+        self._thread: threading.Thread = None
+        self._tty = mylog.console().isatty()
+        self._shown = False
+
+    # Add handled items, only an addition on the hot path
+    def advance(self, n: int = 1):
+        self.done += n
+
+    # Format the progress line
+    def _format(self) -> str:
+        elapsed = time.perf_counter() - self._start
+        rate = self.done / elapsed if elapsed > 0 else 0.0
+        if self.total:
+            return f"{self.label}: {self.done}/{self.total} ({self.done * 100 // self.total}%) {rate:.0f}/s"
+        return f"{self.label}: {self.done} {rate:.0f}/s"
+
+    # Display the progress until stopped
+    def _run(self):
+        interval = self.tty_interval if self._tty else self.pipe_interval
+        while not self._stop.wait(interval):
+            self._shown = True
+            # Overwrite the line on a terminal
+            if self._tty:
+                mylog.console().write("\r" + self._format())
+            else:
+                mylog.console().write(self._format() + "\n")
+            mylog.flush()
+
+    # Start the display
+    def __enter__(self):
+        self._start = time.perf_counter()
+        # Only when the progress is shown on the console (not in the batch workers)
+        if mylog.isDisplayed("info"):
+            mylog.flush()
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+            mylog.setStatusLine(self._tty)
+        return self
+
+    # Stop the display and give the final summary (only for the stages long enough to show a progress)
+    def __exit__(self, *exc):
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        # Erase the progress line
+        if self._tty:
+            mylog.console().write("\r\033[K")
+            mylog.setStatusLine(False)
+        if self._shown:
+            elapsed = time.perf_counter() - self._start
+            mylog.display("%s: %d items in %.2fs", self.label, self.done, elapsed)
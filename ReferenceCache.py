@@ -0,0 +1,168 @@
+from dataclasses import asdict
+from pathlib import Path
+from typing import Dict, List, Tuple
+import hashlib
+import json
+from TreeIndex import TreeIndex
+from RunStats import RunStats
+
+# Non instantiable class caching the parsed and resolved property files between runs
+class ReferenceCache:
+
+    ### Privates properties ###
+
+    # Version of the cached data, to change when the parsing or the resolution changes
+    _version = 7
+
+    # Connection to the cache database (None when disabled)
+    _connection: "sqlite3.Connection" = None
+
+    # Rows to write when the cache is closed, so concurrent processes only lock the database briefly
+    _parsed_rows: List[tuple] = []
+    _resolved_rows: List[tuple] = []
+
+    # Seconds to wait for another process writing the cache
+    _timeout = 60
+
+    ### Init ###
+
+    # Open the cache
+    @classmethod
+    def init(cls, path: str):
+        """Open the cache database, creating it if needed
+
+        Args:
+            path (str): The cache database, None or empty to disable the cache
+        """
+
+        # Close the previous cache
+        cls.close()
+
+        # Disabled cache
+        if not path:
+            return
+
+        # Open the database
+        import sqlite3
+        cls._connection = sqlite3.connect(path, timeout=cls._timeout)
+        cls._parsed_rows = []
+        cls._resolved_rows = []
+        # Drop the tables of another version, their columns may differ
+        if cls._connection.execute("PRAGMA user_version").fetchone()[0] != cls._version:
+            cls._connection.executescript("DROP TABLE IF EXISTS parsed; DROP TABLE IF EXISTS resolved; PRAGMA user_version = %d;" % cls._version)
+        cls._connection.executescript("""
+            CREATE TABLE IF NOT EXISTS parsed (
+                path TEXT, content_hash TEXT, properties TEXT,
+                PRIMARY KEY (path, content_hash)
+            );
+            CREATE TABLE IF NOT EXISTS resolved (
+                path TEXT, content_hash TEXT, fingerprint TEXT, properties TEXT, records TEXT, targets TEXT, kinds TEXT,
+                PRIMARY KEY (path, content_hash, fingerprint)
+            );
+        """)
+
+    # Verify if the cache is enabled
+    @classmethod
+    def isEnabled(cls) -> bool:
+        return cls._connection is not None
+
+    # Save and close the cache
+    @classmethod
+    def close(cls):
+        # Write the rows, commit and close the database
+        if cls._connection is not None:
+            with cls._connection:
+                cls._connection.executemany("INSERT OR REPLACE INTO parsed VALUES (?, ?, ?)", cls._parsed_rows)
+                cls._connection.executemany("INSERT OR REPLACE INTO resolved VALUES (?, ?, ?, ?, ?, ?, ?)", cls._resolved_rows)
+            cls._parsed_rows = []
+            cls._resolved_rows = []
+            cls._connection.close()
+            cls._connection = None
+
+    ### Keys ###
+
+    # Hash the content of a file
+    @classmethod
+    def contentHash(cls, content: bytes) -> str:
+        # Return the hash of the content for this version
+        return hashlib.sha1(b"%d\0%s" % (cls._version, content)).hexdigest()
+
+    # Fingerprint of everything a resolution depends on besides the file itself
+    @classmethod
+    def fingerprint(cls, index: TreeIndex, config, replaceable_pathroot: Dict[str, str]) -> str:
+        """Fingerprint of everything a resolution depends on besides the file itself
+
+        Args:
+            index (TreeIndex): The index of the original tree
+            config (PropertyFileConfig): The property file configuration
+            replaceable_pathroot (Dict[str, str]): The replaceable path roots
+
+        Returns:
+            str: The fingerprint
+        """
+        # Hash the version, the rules and the tree
+        digest = hashlib.sha1(json.dumps([cls._version, asdict(config), replaceable_pathroot]).encode())
+        digest.update(index.fingerprint().encode())
+        return digest.hexdigest()
+
+    ### Parsed properties ###
+
+    # Get the parsed properties of a file
+    @classmethod
+    def getProperties(cls, path: Path, content_hash: str) -> Dict[str, str]:
+        """Get the parsed properties of a file
+
+        Args:
+            path (Path): The PathMachine absolute path of the file
+            content_hash (str): The hash of the file content
+
+        Returns:
+            Dict[str, str]: The properties, None if not cached
+        """
+        # Disabled cache
+        if cls._connection is None:
+            return None
+        # Find the row
+        row = cls._connection.execute("SELECT properties FROM parsed WHERE path = ? AND content_hash = ?", (str(path), content_hash)).fetchone()
+        RunStats.count("cache.parsed.hits" if row else "cache.parsed.misses")
+        return json.loads(row[0]) if row else None
+
+    # Set the parsed properties of a file
+    @classmethod
+    def setProperties(cls, path: Path, content_hash: str, properties: Dict[str, str]):
+        # Save the row
+        if cls._connection is not None:
+            cls._parsed_rows.append((str(path), content_hash, json.dumps(properties)))
+
+    ### Resolved references ###
+
+    # Get the resolved properties of a file
+    @classmethod
+    def getReferences(cls, path: Path, content_hash: str, fingerprint: str) -> Tuple[Dict[str, str], List[tuple], Dict[str, str], Dict[str, int]]:
+        """Get the resolved properties of a file
+
+        Args:
+            path (Path): The PathMachine absolute path of the file
+            content_hash (str): The hash of the file content
+            fingerprint (str): The fingerprint of the tree and configuration
+
+        Returns:
+            Tuple[Dict[str, str], List[tuple], Dict[str, str], Dict[str, int]]: The resolved properties, the log records of the resolution, the resolution kinds by referenced path and the reference kind counters, None if not cached
+        """
+        # Disabled cache or file without content
+        if cls._connection is None or content_hash is None:
+            return None
+        # Find the row
+        row = cls._connection.execute("SELECT properties, records, targets, kinds FROM resolved WHERE path = ? AND content_hash = ? AND fingerprint = ?", (str(path), content_hash, fingerprint)).fetchone()
+        RunStats.count("cache.resolved.hits" if row else "cache.resolved.misses")
+        if not row:
+            return None
+        return json.loads(row[0]), [tuple(record) for record in json.loads(row[1])], json.loads(row[2]), json.loads(row[3])
+
+    # Set the resolved properties of a file
+    @classmethod
+    def setReferences(cls, path: Path, content_hash: str, fingerprint: str, properties: Dict[str, object], records: List[tuple], references: Dict[str, str], kinds: Dict[str, int]):
+        # Save the row
+        if cls._connection is not None and content_hash is not None and properties is not None:
+            properties = {key: str(value) for key, value in properties.items()}
+            cls._resolved_rows.append((str(path), content_hash, fingerprint, json.dumps(properties), json.dumps(records), json.dumps(references), json.dumps(kinds)))
@@ -0,0 +1,95 @@
+from collections import deque
+from pathlib import Path
+from typing import Dict, Iterable, List, Tuple
+import posixpath
+from broken_path import repair_string
+from PackPath import PackPath
+
+# Renames repairing the broken names of a tree, computed in memory before touching the pack
+class RenamePlan:
+
+    def __init__(self, tree: Iterable[Path]):
+        """Plan the renames repairing the broken names of a tree
+
+        The tree is planned directory by directory, parents first. Only the entries whose own name is broken
+        are renamed, the content of a renamed directory follows it. A repaired name already used in its
+        directory gets the first free suffix (_2, _3...), the names that need no repair are never changed.
+
+        Args:
+            tree (Iterable[Path]): The pack tree (PathMachine absolute paths)
+        """
+
+        # Planned path by original path, for the paths that change
+        self._targets: Dict[Path, Path] = {}
+
+        # Renames as (original path, path when renamed, new path), parents first
+        self.renames: List[Tuple[Path, Path, Path]] = []
+
+        # Renamed paths whose repaired name was already used, as (original path, repaired path)
+        self.collisions: List[Tuple[Path, Path]] = []
+
+        # Children by directory
+        children: Dict[Path, List[Path]] = {}
+        for path in tree:
+            children.setdefault(path.parent, []).append(path)
+
+        # Plan the directories, parents first
+        pending = deque([PackPath.of("/")])
+        while pending:
+            directory = pending.popleft()
+            self._planDirectory(self.target(directory), children.get(directory, ()))
+            pending.extend(path for path in children.get(directory, ()) if path in children)
+
+    # Plan the children of a directory
+    def _planDirectory(self, parent: Path, paths: List[Path]):
+        """Plan the children of a directory
+
+        Args:
+            parent (Path): The planned path of the directory
+            paths (List[Path]): The original paths of its children
+        """
+        # Repaired name of each child
+        names = [(path, self.repairName(path.name)) for path in paths]
+        # The names that need no repair are kept
+        used = {name for path, name in names if name == path.name}
+        for path, name in names:
+            if name == path.name and parent != path.parent:
+                self._targets[path] = PackPath.of(posixpath.join(str(parent), name))
+        # The broken names take the first free name, in name order to be the same from the archive or the disk
+        for path, name in sorted(((path, name) for path, name in names if name != path.name), key=lambda item: item[0].name):
+            final, n = name, 2
+            while final in used:
+                final, n = self.suffixed(name, n), n + 1
+            used.add(final)
+            target = self._targets[path] = PackPath.of(posixpath.join(str(parent), final))
+            self.renames.append((path, PackPath.of(posixpath.join(str(parent), path.name)), target))
+            if final != name:
+                self.collisions.append((path, PackPath.of(posixpath.join(str(parent), name))))
+
+    # Repair a name
+    @staticmethod
+    def repairName(name: str) -> str:
+        repaired = repair_string(name)
+        # A name without any valid character becomes "_"
+        if repaired in (".", ""):
+            return "_"
+        # A stem without any valid character too, the name would be hidden
+        if repaired.startswith(".") and not name.startswith("."):
+            return "_" + repaired
+        return repaired
+
+    # Add a suffix to a name, before its extensions
+    @staticmethod
+    def suffixed(name: str, n: int) -> str:
+        stem, dot, extensions = name.partition(".")
+        return f"{stem}_{n}{dot}{extensions}"
+
+    # Get the planned path of a path
+    def target(self, path: Path) -> Path:
+        # The path itself when it does not change
+        return self._targets.get(path, path)
+
+    # Get the paths that change
+    def targets(self) -> Iterable[Tuple[Path, Path]]:
+        # Original and planned paths
+        return self._targets.items()
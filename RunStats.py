@@ -0,0 +1,149 @@
+from contextlib import contextmanager
+from typing import Dict
+import json
+import time
+from mylog import display
+
+# Non instantiable class collecting the stage timings and the counters of a run
+class RunStats:
+
+    ### Privates properties ###
+
+    # Stages by name, in execution order
+    _stages: Dict[str, Dict[str, float]] = {}
+
+    # Counters by name
+    _counters: Dict[str, int] = {}
+
+    # Captured counters (None when not capturing)
+    _captured: Dict[str, int] = None
+
+    # Counters reported as hit rates
+    _rates = {
+        "Resolution cache": "resolve",
+        "Parsed files cache": "cache.parsed",
+        "Resolved files cache": "cache.resolved",
+    }
+
+    ### Collect ###
+
+    # Forget the previous run
+    @classmethod
+    def reset(cls):
+        cls._stages = {}
+        cls._counters = {}
+
+    # Time a stage
+    @classmethod
+    @contextmanager
+    def stage(cls, name: str):
+        """Time a stage, the time of a stage run several times is added up
+
+        Args:
+            name (str): The stage name
+
+        Yields:
+            dict: The stage, set its "items" to the number of handled items
+        """
+        entry = cls._stages.setdefault(name, {"time": 0.0, "items": None})
+        start = time.perf_counter()
+        try:
+            yield entry
+        finally:
+            entry["time"] += time.perf_counter() - start
+
+    # Get the stages and the counters, to restore them later
+    @classmethod
+    def getState(cls) -> dict:
+        return {"stages": cls._stages, "counters": cls._counters}
+
+    # Restore the stages and the counters
+    @classmethod
+    def setState(cls, state: dict):
+        cls._stages = state["stages"]
+        cls._counters = state["counters"]
+
+    # Increment a counter
+    @classmethod
+    def count(cls, name: str, n: int = 1):
+        counters = cls._counters if cls._captured is None else cls._captured
+        counters[name] = counters.get(name, 0) + n
+
+    # Get a counter
+    @classmethod
+    def getCounter(cls, name: str) -> int:
+        return cls._counters.get(name, 0)
+
+    # Capture the counters instead of adding them up
+    @classmethod
+    @contextmanager
+    def capture(cls):
+        """Capture the counters, in a worker, to merge them later in the main process
+
+        Yields:
+            dict: The captured counters
+        """
+        previous, cls._captured = cls._captured, {}
+        try:
+            yield cls._captured
+        finally:
+            cls._captured = previous
+
+    # Add up captured counters
+    @classmethod
+    def merge(cls, counters: Dict[str, int]):
+        for name, n in counters.items():
+            cls.count(name, n)
+
+    ### Report ###
+
+    # Hit rate of a counter pair
+    @classmethod
+    def hitRate(cls, prefix: str) -> float:
+        """Hit rate of the "<prefix>.hits" and "<prefix>.misses" counters
+
+        Args:
+            prefix (str): The counters prefix
+
+        Returns:
+            float: The hit rate, None without lookups
+        """
+        hits, misses = cls.getCounter(prefix + ".hits"), cls.getCounter(prefix + ".misses")
+        return hits / (hits + misses) if hits + misses else None
+
+    # Get the report of the run
+    @classmethod
+    def getReport(cls) -> dict:
+        return {
+            "stages": {name: dict(entry) for name, entry in cls._stages.items()},
+            "counters": dict(sorted(cls._counters.items())),
+            "hit_rates": {prefix: cls.hitRate(prefix) for prefix in cls._rates.values()},
+        }
+
+    # Display the summary of the run
+    @classmethod
+    def summary(cls):
+        display("Summary:")
+        # Stages
+        for name, entry in cls._stages.items():
+            items = "" if entry["items"] is None else f" ({entry['items']} items)"
+            display("  %-16s %8.3fs%s", name, entry["time"], items)
+        # Resolved references
+        display("  References: %d direct, %d ambiguous, %d unresolved, %d external", cls.getCounter("references.direct"), cls.getCounter("references.ambiguous"), cls.getCounter("references.unresolved"), cls.getCounter("references.external"))
+        # Hit rates
+        for label, prefix in cls._rates.items():
+            rate = cls.hitRate(prefix)
+            if rate is not None:
+                display("  %s: %d hits, %d misses (%.0f%%)", label, cls.getCounter(prefix + ".hits"), cls.getCounter(prefix + ".misses"), rate * 100)
+
+    # Write the report of the run
+    @classmethod
+    def writeReport(cls, path: str, report: dict = None):
+        """Write a report as JSON
+
+        Args:
+            path (str): The report file
+            report (dict, optional): The report to write. Defaults to the report of the run.
+        """
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(cls.getReport() if report is None else report, f, indent=4)
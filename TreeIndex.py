@@ -0,0 +1,213 @@
+from pathlib import Path
+from typing import Dict, List, NamedTuple
+import hashlib
+
+# Metadata of a tree entry
+class TreeEntry(NamedTuple):
+    # Directory or file
+    is_dir: bool
+    # Size in bytes
+    size: int
+    # Modification time
+    mtime: float
+
+# Hash index over a pack tree
+class TreeIndex:
+
+    def __init__(self, tree: List[Path], entries: List[TreeEntry]):
+        """Build the index of a tree
+
+        Args:
+            tree (List[Path]): The pack tree (PathMachine absolute paths)
+            entries (List[TreeEntry]): The metadata of each path of the tree
+        """
+
+        # Ordered tree
+        self._tree = tree
+
+        # Normalized path to path
+        self._paths: Dict[str, Path] = {}
+
+        # Normalized path to position in the tree
+        self._positions: Dict[str, int] = {}
+
+        # Normalized path to metadata
+        self._entries: Dict[str, TreeEntry] = {}
+
+        # Stem to paths
+        self._stems: Dict[str, List[Path]] = {}
+
+        # Suffix free path to paths by suffix
+        self._suffixless: Dict[str, Dict[str, Path]] = {}
+
+        # Index all the paths
+        for position, (path, entry) in enumerate(zip(tree, entries)):
+            self.add(path, position, entry)
+
+    # Normalize a path to an index key
+    @staticmethod
+    def key(path: Path) -> str:
+        """Normalize a path to an index key
+
+        Args:
+            path (Path): The path to normalize
+
+        Returns:
+            str: The index key
+        """
+        return str(path).replace("\\", "/")
+
+    # Add a path to the index
+    def add(self, path: Path, position: int, entry: TreeEntry):
+        """Add a path to the index
+
+        Args:
+            path (Path): The path to add
+            position (int): The position of the path in the tree
+            entry (TreeEntry): The metadata of the path
+        """
+
+        # Index key
+        key = self.key(path)
+
+        # Index the path
+        self._paths[key] = path
+        self._positions[key] = position
+        self._entries[key] = entry
+
+        # Index by stem
+        self._stems.setdefault(path.stem, []).append(path)
+
+        # Index by suffix free path
+        if path.suffix:
+            self._suffixless.setdefault(self.key(path.with_suffix("")), {}).setdefault(path.suffix, path)
+
+    # Fingerprint of the tree structure
+    def fingerprint(self) -> str:
+        """Fingerprint of the tree structure, independent of the tree order
+
+        Returns:
+            str: The fingerprint
+        """
+        # Hash the sorted paths and their type
+        digest = hashlib.sha1()
+        for key in sorted(self._paths):
+            digest.update(f"{key}\0{int(self._entries[key].is_dir)}\n".encode())
+        return digest.hexdigest()
+
+    # Verify if the path is in the tree
+    def __contains__(self, path: Path) -> bool:
+        return self.key(path) in self._paths
+
+    # Number of paths in the tree
+    def __len__(self) -> int:
+        return len(self._paths)
+
+    # Get the indexed path
+    def get(self, path: Path) -> Path:
+        """Get the indexed path
+
+        Args:
+            path (Path): The path to get
+
+        Returns:
+            Path: The indexed path, None if not in the tree
+        """
+        return self._paths.get(self.key(path))
+
+    # Get the metadata of a path
+    def entry(self, path: Path) -> TreeEntry:
+        """Get the metadata of a path
+
+        Args:
+            path (Path): The path
+
+        Returns:
+            TreeEntry: The metadata, None if not in the tree
+        """
+        return self._entries.get(self.key(path))
+
+    # Get the position of a path in the tree
+    def position(self, path: Path) -> int:
+        """Get the position of a path in the tree
+
+        Args:
+            path (Path): The path
+
+        Raises:
+            ValueError: If the path is not in the tree
+
+        Returns:
+            int: The position of the path
+        """
+
+        # Get the position
+        position = self._positions.get(self.key(path))
+
+        # Should be in the tree
+        if position is None:
+            raise ValueError(f"{path} is not in the tree")
+
+        # Return the position
+        return position
+
+    # Get the paths with a given stem
+    def byStem(self, stem: str) -> List[Path]:
+        """Get the paths with a given stem
+
+        Args:
+            stem (str): The stem
+
+        Returns:
+            List[Path]: The paths, in tree order
+        """
+        return self._stems.get(stem, [])
+
+    # Get the paths whose stem is contained in a given stem
+    def byStemWithin(self, stem: str) -> List[Path]:
+        """Get the paths whose stem is contained in a given stem
+
+        Args:
+            stem (str): The containing stem
+
+        Returns:
+            List[Path]: The paths, in tree order
+        """
+
+        # Every distinct substring of the stem (empty included)
+        substrings = {stem[start:end] for start in range(len(stem) + 1) for end in range(start, len(stem) + 1)}
+
+        # Collect the paths of every indexed substring
+        paths = [path for substring in substrings for path in self._stems.get(substring, [])]
+
+        # Return them in tree order
+        return sorted(paths, key=lambda path: self._positions[self.key(path)])
+
+    # Find the path with the first matching expected extension
+    def withExtensions(self, path: Path, expected_extensions: List[str]) -> Path:
+        """Find the path with the first matching expected extension
+
+        Args:
+            path (Path): The path without suffix
+            expected_extensions (List[str]): The expected extensions, by priority
+
+        Returns:
+            Path: The path with the extension, None if not found
+        """
+
+        # Get all the suffixes of the path
+        suffixes = self._suffixless.get(self.key(path))
+
+        # If no suffixes
+        if not suffixes:
+            return None
+
+        # For each expected extension
+        for extension in expected_extensions:
+            # If the path exists with the extension
+            if extension in suffixes:
+                # Return it
+                return suffixes[extension]
+
+        # Else return none
+        return None
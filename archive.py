@@ -0,0 +1,479 @@
+import os
+import shutil
+import struct
+import tempfile
+import zlib
+from typing import Callable, Dict, List, Tuple
+from zipfile import ZipFile, ZipInfo, ZIP_STORED, ZIP_DEFLATED, ZIP_BZIP2, ZIP_LZMA, ZIP64_LIMIT, BadZipFile
+
+# Local file header layout (signature, versions, flags, method, time, date, crc, sizes, name and extra lengths)
+_local_header = struct.Struct("<4s2B4HL2L2H")
+_local_header_signature = b"PK\003\004"
+
+# Central directory header layout (signature, versions, flags, method, time, date, crc, sizes, name, extra and comment lengths, disk, attributes and offset)
+_central_header = struct.Struct("<4s4B4HL2L5H2L")
+_central_header_signature = b"PK\001\002"
+
+# Compression methods by config name
+compression_methods = {
+    "stored": ZIP_STORED,
+    "deflated": ZIP_DEFLATED,
+    "bzip2": ZIP_BZIP2,
+    "lzma": ZIP_LZMA
+}
+
+# Minimal size of an extraction batch
+_min_batch_size = 1 << 20
+
+# Per worker archive handles
+_worker_zip: ZipFile = None
+_worker_raw = None
+
+# Get the target path of a member in the extract directory
+def member_target(root: str, name: str) -> str:
+    """Get the target path of a member in the extract directory
+
+    Args:
+        root (str): The extract directory
+        name (str): The member name
+
+    Returns:
+        str: The target path, with ".", ".." and empty parts removed
+    """
+    # Keep only the safe parts of the name
+    parts = [part for part in name.replace("\\", "/").split("/") if part not in ("", ".", "..")]
+    # Build the target path
+    return os.path.join(root, *parts)
+
+# Get the offset of the member data in the archive
+def member_data_offset(raw, zinfo: ZipInfo) -> int:
+    """Get the offset of the member data in the archive
+
+    Args:
+        raw (BinaryIO): The raw archive file
+        zinfo (ZipInfo): The member
+
+    Raises:
+        BadZipFile: If the local header is invalid
+
+    Returns:
+        int: The offset of the first data byte
+    """
+    # Read the local header
+    raw.seek(zinfo.header_offset)
+    header = raw.read(_local_header.size)
+    # Verify the local header
+    if len(header) != _local_header.size or header[:4] != _local_header_signature:
+        raise BadZipFile(f"Bad local header for member {zinfo.filename}")
+    fields = _local_header.unpack(header)
+    # Data start after the name and the extra field
+    return zinfo.header_offset + _local_header.size + fields[-2] + fields[-1]
+
+# Copy a stored member raw range to a file
+def copy_stored_member(raw, zinfo: ZipInfo, target: str):
+    """Copy a stored (uncompressed) member raw range to a file
+
+    Args:
+        raw (BinaryIO): The raw archive file
+        zinfo (ZipInfo): The stored member
+        target (str): The target path
+
+    Raises:
+        BadZipFile: If the copied data does not match the member CRC
+    """
+    # Go to the member data
+    raw.seek(member_data_offset(raw, zinfo))
+    # Copy the range and compute the CRC
+    crc = 0
+    remaining = zinfo.compress_size
+    with open(target, "wb") as f:
+        while remaining > 0:
+            chunk = raw.read(min(remaining, 1 << 20))
+            if not chunk:
+                raise BadZipFile(f"Truncated member {zinfo.filename}")
+            crc = zlib.crc32(chunk, crc)
+            f.write(chunk)
+            remaining -= len(chunk)
+    # Verify the CRC
+    if crc != zinfo.CRC:
+        raise BadZipFile(f"Bad CRC-32 for member {zinfo.filename}")
+
+# Remove the zip64 block from an extra field
+def strip_zip64_extra(extra: bytes) -> bytes:
+    """Remove the zip64 block from an extra field
+
+    Args:
+        extra (bytes): The extra field
+
+    Returns:
+        bytes: The extra field without zip64 block
+    """
+    # Keep every block but the zip64 one
+    blocks, i = [], 0
+    while i + 4 <= len(extra):
+        block_id, size = struct.unpack("<HH", extra[i:i + 4])
+        if block_id != 1:
+            blocks.append(extra[i:i + 4 + size])
+        i += 4 + size
+    return b"".join(blocks)
+
+# Archive writer copying compressed members without recompressing them
+class ArchiveWriter:
+
+    def __init__(self, path: str):
+        """Open an archive for writing
+
+        ZipFile has no public way to write already compressed data, so the archive structure
+        (local headers, central directory and zip64 records) is written here. The new contents are
+        compressed by ZipFile in a temporary archive, then copied like the other members.
+
+        Args:
+            path (str): The archive to write
+        """
+        # Output file and temporary archive of the compressed contents
+        self._file = open(path, "wb")
+        self._temp = None
+        # Central directory entries as (member, header offset), and the written names
+        self._entries: List[Tuple[ZipInfo, int]] = []
+        self._names = set()
+
+    # Verify if a name is already written
+    def __contains__(self, arcname: str) -> bool:
+        return arcname in self._names
+
+    # Close on exit
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # Copy a member compressed data
+    def copy(self, raw, zinfo: ZipInfo, arcname: str):
+        """Copy a member compressed data from another archive, without recompressing it
+
+        Args:
+            raw (BinaryIO): The raw source archive file
+            zinfo (ZipInfo): The source member
+            arcname (str): The name of the member in this archive
+        """
+        # Build the new member from the source one
+        new = ZipInfo(arcname, zinfo.date_time)
+        new.compress_type = zinfo.compress_type
+        new.create_system = zinfo.create_system
+        new.external_attr = zinfo.external_attr
+        new.extra = strip_zip64_extra(zinfo.extra)
+        new.CRC = zinfo.CRC
+        new.compress_size = zinfo.compress_size
+        new.file_size = zinfo.file_size
+        # Sizes and CRC are known so there is no data descriptor, and the name flag follows the new name
+        new.flag_bits = zinfo.flag_bits & ~0x808 | (0 if arcname.isascii() else 0x800)
+        # Write the local header
+        offset = self._file.tell()
+        self._file.write(self._header(new, offset, central=False))
+        # Copy the compressed data
+        raw.seek(member_data_offset(raw, zinfo))
+        remaining = zinfo.compress_size
+        while remaining > 0:
+            chunk = raw.read(min(remaining, 1 << 20))
+            if not chunk:
+                raise BadZipFile(f"Truncated member {zinfo.filename}")
+            self._file.write(chunk)
+            remaining -= len(chunk)
+        # Register the member
+        self._entries.append((new, offset))
+        self._names.add(arcname)
+
+    # Compress a new content
+    def writestr(self, zinfo: ZipInfo, data: bytes, compression: str = "deflated", level: int = None):
+        """Compress and write a new content
+
+        Args:
+            zinfo (ZipInfo): The member, with its name, date and attributes
+            data (bytes): The content
+            compression (str, optional): The compression method. Defaults to "deflated".
+            level (int, optional): The compression level. Defaults to None.
+        """
+        self._compressed(lambda temp: temp.writestr(zinfo, data, compression_methods[compression], level))
+
+    # Compress a file
+    def write(self, path: str, arcname: str, compression: str = "deflated", level: int = None):
+        """Compress and write a file or a directory, with its date and permissions
+
+        Args:
+            path (str): The system path
+            arcname (str): The name of the member
+            compression (str, optional): The compression method. Defaults to "deflated".
+            level (int, optional): The compression level. Defaults to None.
+        """
+        self._compressed(lambda temp: temp.write(path, arcname, compression_methods[compression], level))
+
+    # Compress a member with ZipFile in the temporary archive and copy it
+    def _compressed(self, add: Callable[[ZipFile], None]):
+        # One temporary file, emptied for each member
+        if self._temp is None:
+            self._temp = tempfile.TemporaryFile()
+        self._temp.seek(0)
+        self._temp.truncate()
+        with ZipFile(self._temp, "w") as temp:
+            add(temp)
+            zinfo = temp.infolist()[0]
+        self.copy(self._temp, zinfo, zinfo.filename)
+
+    # Build the local or central header of a member
+    @staticmethod
+    def _header(zinfo: ZipInfo, offset: int, central: bool) -> bytes:
+        # Values too large for their field are in the zip64 extra block, in this order
+        zip64 = []
+        file_size, compress_size = zinfo.file_size, zinfo.compress_size
+        if file_size > ZIP64_LIMIT or compress_size > ZIP64_LIMIT:
+            zip64 += [file_size, compress_size]
+            file_size = compress_size = 0xFFFFFFFF
+        if central and offset > ZIP64_LIMIT:
+            zip64.append(offset)
+            offset = 0xFFFFFFFF
+        extra = (struct.pack("<HH%dQ" % len(zip64), 1, 8 * len(zip64), *zip64) if zip64 else b"") + zinfo.extra
+        # Version needed by the method and the zip64 block
+        version = {ZIP_BZIP2: 46, ZIP_LZMA: 63}.get(zinfo.compress_type, 45 if zip64 else 20)
+        # DOS date and time
+        year, month, day, hour, minute, second = zinfo.date_time
+        dos_time = hour << 11 | minute << 5 | second // 2
+        dos_date = (year - 1980) << 9 | month << 5 | day
+        name = zinfo.filename.encode("utf-8" if zinfo.flag_bits & 0x800 else "ascii")
+        if not central:
+            return _local_header.pack(_local_header_signature, version, 0, zinfo.flag_bits, zinfo.compress_type, dos_time, dos_date, zinfo.CRC, compress_size, file_size, len(name), len(extra)) + name + extra
+        return _central_header.pack(_central_header_signature, version, zinfo.create_system, version, 0, zinfo.flag_bits, zinfo.compress_type, dos_time, dos_date, zinfo.CRC, compress_size, file_size, len(name), len(extra), 0, 0, 0, zinfo.external_attr, offset) + name + extra
+
+    # Write the central directory and close the archive
+    def close(self):
+        if self._file is None:
+            return
+        try:
+            # Central directory
+            start = self._file.tell()
+            for zinfo, offset in self._entries:
+                self._file.write(self._header(zinfo, offset, central=True))
+            size = self._file.tell() - start
+            count = len(self._entries)
+            # Zip64 end of central directory when a value does not fit
+            if count >= 0xFFFF or start > ZIP64_LIMIT or size > ZIP64_LIMIT:
+                end = self._file.tell()
+                self._file.write(struct.pack("<4sQ2H2L4Q", b"PK\006\006", 44, 45, 45, 0, 0, count, count, size, start))
+                self._file.write(struct.pack("<4sLQL", b"PK\006\007", 0, end, 1))
+                count, size, start = min(count, 0xFFFF), min(size, 0xFFFFFFFF), min(start, 0xFFFFFFFF)
+            # End of central directory
+            self._file.write(struct.pack("<4s4H2LH", b"PK\005\006", 0, 0, count, count, size, start, 0))
+        finally:
+            self._file.close()
+            self._file = None
+            if self._temp is not None:
+                self._temp.close()
+
+# Rewrite an archive into another one
+def rewrite_archive(source: str, target: str, rename: Callable[[str], str], contents: Dict[str, bytes], compression: str = "deflated", level: int = None, progress: Callable[[int], None] = None) -> List[str]:
+    """Stream every member of an archive into another one
+
+    Args:
+        source (str): The source archive
+        target (str): The target archive
+        rename (Callable[[str], str]): Give the target name of a source member name, None to drop the member
+        contents (Dict[str, bytes]): New contents by source member name, other members are copied without recompressing
+        compression (str, optional): The compression method of the new contents. Defaults to "deflated".
+        level (int, optional): The compression level of the new contents. Defaults to None.
+        progress (Callable[[int], None], optional): Called with the number of handled members. Defaults to None.
+
+    Returns:
+        List[str]: The source members skipped because their target name was already written
+    """
+    # Skipped members
+    skipped = []
+    # Open the archives
+    with ZipFile(source, "r") as zin, open(source, "rb") as raw, ArchiveWriter(target) as zout:
+        # For each member
+        for zinfo in zin.infolist():
+            # Report the progress
+            if progress:
+                progress(1)
+            # Get the target name
+            arcname = rename(zinfo.filename)
+            # Drop the member
+            if arcname is None:
+                continue
+            # Skip the member if the name is already taken
+            if arcname in zout:
+                skipped.append(zinfo.filename)
+                continue
+            # Copy the compressed data of the unchanged members
+            if zinfo.filename not in contents or (len(contents[zinfo.filename]) == zinfo.file_size and zlib.crc32(contents[zinfo.filename]) == zinfo.CRC):
+                zout.copy(raw, zinfo, arcname)
+            # Else write the new content
+            else:
+                new = ZipInfo(arcname, zinfo.date_time)
+                new.external_attr = zinfo.external_attr
+                zout.writestr(new, contents[zinfo.filename], compression, level)
+    # Return the skipped members
+    return skipped
+
+# Compute the CRC of a file
+def file_crc(path: str) -> int:
+    """Compute the CRC-32 of a file
+
+    Args:
+        path (str): The file
+
+    Returns:
+        int: The CRC-32
+    """
+    # Read the file by chunks
+    crc = 0
+    with open(path, "rb") as f:
+        while chunk := f.read(1 << 20):
+            crc = zlib.crc32(chunk, crc)
+    return crc
+
+# Write files to an archive, reusing the members of the source archive
+def write_archive(source: str, target: str, files: List[Tuple[str, str, str]], compression: str = "deflated", level: int = None, progress: Callable[[int], None] = None) -> int:
+    """Write files to an archive, copying the compressed data of the files unchanged since the source archive
+
+    Args:
+        source (str): The source archive
+        target (str): The target archive
+        files (List[Tuple[str, str, str]]): The files as (system path, name in the target archive, name in the source archive)
+        compression (str, optional): The compression method of the changed files. Defaults to "deflated".
+        level (int, optional): The compression level of the changed files. Defaults to None.
+        progress (Callable[[int], None], optional): Called with the number of handled files. Defaults to None.
+
+    Returns:
+        int: The number of members copied without recompressing
+    """
+    # Copied members
+    copied = 0
+    # Open the archives
+    with ZipFile(source, "r") as zin, open(source, "rb") as raw, ArchiveWriter(target) as zout:
+        # Source members by normalized name
+        members = {zinfo.filename.replace("\\", "/").strip("/"): zinfo for zinfo in zin.infolist()}
+        # For each file
+        for path, arcname, original in files:
+            # Report the progress
+            if progress:
+                progress(1)
+            zinfo = members.get(original.replace("\\", "/").strip("/"))
+            # Copy the compressed data of the unchanged files
+            if zinfo and not zinfo.is_dir() and os.path.isfile(path) and os.path.getsize(path) == zinfo.file_size and file_crc(path) == zinfo.CRC:
+                zout.copy(raw, zinfo, arcname.replace("\\", "/").lstrip("/"))
+                copied += 1
+            # Else compress the file
+            else:
+                zout.write(path, arcname, compression, level)
+    # Return the number of copied members
+    return copied
+
+# Open the archive once per worker
+def _init_worker(zip_filename: str):
+    global _worker_zip, _worker_raw
+    # Archive used for compressed members
+    _worker_zip = ZipFile(zip_filename, "r")
+    # Raw file used for stored members
+    _worker_raw = open(zip_filename, "rb")
+
+# Extract a batch of members with the worker archive
+def _extract_batch(names: List[str], path: str) -> int:
+    # For each member of the batch
+    for name in names:
+        zinfo = _worker_zip.getinfo(name)
+        target = member_target(path, name)
+        try:
+            # Stored members are copied as raw ranges
+            if zinfo.compress_type == ZIP_STORED and not zinfo.flag_bits & 0x1:
+                copy_stored_member(_worker_raw, zinfo, target)
+            # Others are decompressed
+            else:
+                with _worker_zip.open(zinfo) as source, open(target, "wb") as f:
+                    shutil.copyfileobj(source, f, 1 << 20)
+        except Exception as e:
+            # Report the failing member
+            raise RuntimeError(f"Failed to extract '{name}': {e}") from e
+    # Return the number of extracted members
+    return len(names)
+
+# Split members in batches of similar compressed size
+def batch_members(members: List[ZipInfo], n_workers: int) -> List[List[str]]:
+    """Split members in batches of similar compressed size
+
+    Args:
+        members (List[ZipInfo]): The members to split
+        n_workers (int): The number of workers
+
+    Returns:
+        List[List[str]]: The batches of member names
+    """
+    # Target size, a few batches per worker to balance the load
+    total = sum(zinfo.compress_size for zinfo in members)
+    batch_size = max(total // (n_workers * 4), _min_batch_size)
+    # Fill the batches in archive order
+    batches, batch, size = [], [], 0
+    for zinfo in members:
+        batch.append(zinfo.filename)
+        size += zinfo.compress_size
+        if size >= batch_size:
+            batches.append(batch)
+            batch, size = [], 0
+    # Last batch
+    if batch:
+        batches.append(batch)
+    return batches
+
+# Extract an archive in parallel
+def extract(zip_filename: str, path: str, n_workers: int = 0, progress: Callable[[int], None] = None) -> int:
+    """Extract an archive in parallel
+
+    Args:
+        zip_filename (str): The archive
+        path (str): The extract directory
+        n_workers (int, optional): The number of workers, 0 for the CPU count. Defaults to 0.
+        progress (Callable[[int], None], optional): Called with the number of files of each extracted batch. Defaults to None.
+
+    Raises:
+        RuntimeError: If a member can't be extracted
+
+    Returns:
+        int: The number of extracted files
+    """
+    # Worker count
+    n_workers = n_workers or os.cpu_count() or 1
+    # List the members
+    with ZipFile(zip_filename, "r") as zip:
+        members = zip.infolist()
+    # Create every directory up front so workers never race on them
+    files = [zinfo for zinfo in members if not zinfo.is_dir()]
+    directories = {member_target(path, zinfo.filename) for zinfo in members if zinfo.is_dir()}
+    directories.update(os.path.dirname(member_target(path, zinfo.filename)) for zinfo in files)
+    for directory in directories:
+        os.makedirs(directory, exist_ok=True)
+    # Split the files in batches
+    batches = batch_members(files, n_workers)
+    # Count the extracted files and report the progress
+    count = 0
+    def extracted(n: int):
+        nonlocal count
+        count += n
+        if progress:
+            progress(n)
+    # A single batch is extracted in process
+    if len(batches) <= 1 or n_workers == 1:
+        _init_worker(zip_filename)
+        try:
+            for batch in batches:
+                extracted(_extract_batch(batch, path))
+            return count
+        finally:
+            _worker_zip.close()
+            _worker_raw.close()
+    # Else extract the batches with the workers
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+    with ProcessPoolExecutor(min(n_workers, len(batches)), initializer=_init_worker, initargs=(zip_filename,)) as exe:
+        futures = [exe.submit(_extract_batch, batch, path) for batch in batches]
+        # Surface the worker errors
+        for future in as_completed(futures):
+            extracted(future.result())
+        return count
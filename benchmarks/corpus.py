@@ -0,0 +1,44 @@
+from pathlib import Path
+from typing import Iterator, Tuple
+from zipfile import ZipFile
+
+# Iterate over the files of a pack
+def iter_pack_files(path: str) -> Iterator[Tuple[str, bytes]]:
+    """Iterate over the files of a pack
+
+    Args:
+        path (str): The pack, as a zip or a directory
+
+    Yields:
+        Tuple[str, bytes]: The PathMachine absolute path and the content of each file
+    """
+    # From the archive members
+    if path.endswith(".zip"):
+        with ZipFile(path) as zip:
+            for zinfo in zip.infolist():
+                if not zinfo.is_dir():
+                    yield "/" + zinfo.filename.strip("/"), zip.read(zinfo)
+    # Else from the directory
+    else:
+        root = Path(path)
+        for p in root.rglob("*"):
+            if p.is_file():
+                yield "/" + p.relative_to(root).as_posix(), p.read_bytes()
+
+# List the paths of a pack
+def load_paths(path: str) -> list:
+    """List the paths of a pack, directories included
+
+    Args:
+        path (str): The pack, as a zip or a directory
+
+    Returns:
+        list: The PathMachine absolute paths
+    """
+    # From the archive members
+    if path.endswith(".zip"):
+        with ZipFile(path) as zip:
+            return ["/" + name.strip("/") for name in zip.namelist()]
+    # Else from the directory
+    root = Path(path)
+    return ["/" + p.relative_to(root).as_posix() for p in root.rglob("*")]
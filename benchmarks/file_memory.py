@@ -0,0 +1,68 @@
+from argparse import ArgumentParser
+from pathlib import Path
+import gc
+import tracemalloc
+import globvar
+from FileTypes import File
+from PackPath import PackPath
+from PathMachine import PathMachine
+from benchmarks.corpus import load_paths
+
+# Former File representation, used as reference
+class LegacyFile:
+
+    file_dict = {}
+
+    def __init__(self, path: Path):
+        # Resolved, system and parent paths
+        self._packRelativePath = path.resolve()
+        self.path = PathMachine.transformPathToSystemPath(self._packRelativePath)
+        self._packRelativeParent = self._packRelativePath.parent
+        # Add the file to the file dictionary
+        LegacyFile.file_dict[str(self._packRelativePath)] = self
+
+# Measure the memory allocated to build the files of a tree
+def measure(cls, tree: list) -> int:
+    """Measure the memory allocated to build the files of a tree
+
+    Args:
+        cls (type): The file class
+        tree (list): The paths of the files
+
+    Returns:
+        int: The allocated bytes still in use after the build
+    """
+    # Start from an empty file dictionary
+    cls.file_dict = {}
+    gc.collect()
+    tracemalloc.start()
+    for path in tree:
+        cls(path)
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    cls.file_dict = {}
+    return size
+
+def run():
+    # Parse the arguments
+    parser = ArgumentParser(prog="File memory benchmark", description="Compare the memory used by the File objects with their former representation")
+    parser.add_argument("-c", "--corpus", dest="corpus", help="Packs (zip or directory) to take the paths from", metavar="PATH", nargs="*", default=["./tests/Testpack"])
+    parser.add_argument("-s", "--scale", dest="scale", help="Number of copies of the corpus, each in its own directory", type=int, default=100)
+    args = parser.parse_args()
+
+    # Build the paths, the tree is built before the measures as it is shared with PathMachine
+    paths = [f"/copy{copy}{path}" for copy in range(args.scale) for pack in args.corpus for path in load_paths(pack)]
+    if not paths:
+        return
+    globvar.setRootPath("./extracts/benchmark")
+    PathMachine.setRootpath()
+    print(f"{len(paths)} files")
+
+    # Measure both representations
+    legacy = measure(LegacyFile, [Path(path) for path in paths])
+    current = measure(File, [PackPath.of(path) for path in paths])
+    print(f"legacy:  {legacy / len(paths):.0f} bytes/file")
+    print(f"current: {current / len(paths):.0f} bytes/file")
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,53 @@
+from argparse import ArgumentParser
+import timeit
+from FileTypes import parseProperties
+from benchmarks.corpus import iter_pack_files
+
+# Former parser, used as reference
+def legacy_parse(content: str) -> dict:
+    properties = {}
+    # Loop through all the lines
+    for line in content.splitlines():
+        # If the line is a comment or empty
+        if line.strip().startswith("#"):
+            continue
+        elif not line.strip():
+            continue
+        # Split the line into key and value
+        key = line.split("=")[0]
+        value = '='.join(line.split("=")[1:])
+        # If key or value is empty
+        if not key or not value:
+            continue
+        # Add the key and value to the dictionary
+        properties[key.strip()] = value.strip()
+    return properties
+
+def run():
+    # Parse the arguments
+    parser = ArgumentParser(prog="parseProperties benchmark", description="Compare parseProperties with the former parser")
+    parser.add_argument("-c", "--corpus", dest="corpus", help="Packs (zip or directory) to take the property files from", metavar="PATH", nargs="*", default=["./tests/Testpack"])
+    parser.add_argument("-n", "--number", dest="number", help="Number of passes over the corpus", type=int, default=20)
+    args = parser.parse_args()
+
+    # Load the property files
+    corpus = [(path, content.decode("ISO-8859-1")) for pack in args.corpus for path, content in iter_pack_files(pack) if path.endswith(".properties")]
+    size = sum(len(content) for _, content in corpus)
+    print(f"{len(corpus)} property files, {size} characters")
+
+    # Report the files parsed differently (":" separators, continuations and "!" comments)
+    different = [path for path, content in corpus if legacy_parse(content) != parseProperties(content.splitlines())]
+    print(f"{len(different)} files parsed differently")
+    for path in different[:10]:
+        print(f"  {path}")
+
+    # Time both parsers
+    if not size:
+        return
+    legacy = timeit.timeit(lambda: [legacy_parse(content) for _, content in corpus], number=args.number)
+    current = timeit.timeit(lambda: [parseProperties(content.splitlines()) for _, content in corpus], number=args.number)
+    print(f"legacy:  {legacy * 1e9 / (args.number * size):.2f} ns/char")
+    print(f"current: {current * 1e9 / (args.number * size):.2f} ns/char")
+
+if __name__ == "__main__":
+    run()
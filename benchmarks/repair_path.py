@@ -0,0 +1,71 @@
+from argparse import ArgumentParser
+from pathlib import Path
+import timeit
+from broken_path import repair_path, repair_string, replace_table, valid_chars
+from benchmarks.corpus import load_paths
+
+# Former implementation, used as reference
+def legacy_repair_path(path: Path) -> Path:
+    # Replace replace_table characters
+    for char in replace_table.keys():
+        path = Path(str(path).replace(char, replace_table[char]))
+
+    # Put all in lowercase
+    path = Path(str(path).lower())
+
+    # Remove all the invalid characters
+    for char in str(path):
+        if char not in valid_chars:
+            path = Path(str(path).replace(char, ""))
+
+    # Return the repaired path
+    return path
+
+# Tricky names added to the corpus
+extra_names = [
+    "Épée d'Or (1).png",
+    "ŒUVRE [Final] {v2}.properties",
+    "sword’s edge.PNG",
+    "a//b/./c/",
+    "$//a",
+    "/$/#/a",
+    "§",
+    "İstanbul.json",
+    "Sub Dir 2/Nouveau Document texte.properties",
+]
+
+# Load the names of a pack
+def load_corpus(path: str) -> list:
+    # Paths and names
+    paths = load_paths(path)
+    return paths + [Path(p).name for p in paths]
+
+def run():
+    # Parse the arguments
+    parser = ArgumentParser(prog="repair_path benchmark", description="Compare repair_path with its former implementation")
+    parser.add_argument("-c", "--corpus", dest="corpus", help="Packs (zip or directory) to take the names from", metavar="PATH", nargs="*", default=["./tests/Testpack"])
+    parser.add_argument("-n", "--number", dest="number", help="Number of passes over the corpus", type=int, default=20)
+    args = parser.parse_args()
+
+    # Build the corpus
+    corpus = extra_names + [name for pack in args.corpus for name in load_corpus(pack)]
+
+    # Verify the outputs are identical
+    for name in corpus:
+        for value in (name, Path(name)):
+            expected, actual = legacy_repair_path(value), repair_path(value)
+            if expected != actual:
+                raise AssertionError(f"repair_path({value!r}) gave {actual!r} instead of {expected!r}")
+    print(f"{len(corpus)} names repaired identically")
+
+    # Time both implementations
+    legacy = timeit.timeit(lambda: [legacy_repair_path(name) for name in corpus], number=args.number)
+    repair_string.cache_clear()
+    uncached = timeit.timeit(lambda: ([repair_path(name) for name in corpus], repair_string.cache_clear()), number=args.number)
+    cached = timeit.timeit(lambda: [repair_path(name) for name in corpus], number=args.number)
+    print(f"legacy:   {legacy * 1e6 / (args.number * len(corpus)):.2f} us/name")
+    print(f"uncached: {uncached * 1e6 / (args.number * len(corpus)):.2f} us/name")
+    print(f"cached:   {cached * 1e6 / (args.number * len(corpus)):.2f} us/name")
+
+if __name__ == "__main__":
+    run()
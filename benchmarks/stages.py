@@ -0,0 +1,140 @@
+from argparse import ArgumentParser
+from pathlib import Path
+from zipfile import ZipFile
+import json
+import os
+import platform
+import shutil
+import tempfile
+import time
+import globvar
+import main
+import mylog
+from archive import extract, write_archive
+from broken_path import repair_string
+from config import config
+from FileTypes import File, PropertyFile, analyseReferences, generateFiles
+from PackContext import PackContext
+from PathMachine import PathMachine
+from ReferenceCache import ReferenceCache
+from benchmarks.synthetic_pack import add_arguments, generate, generator_arguments
+
+# Run the stages of main.run once and time each of them
+def run_stages(pack: str, work: str, in_memory: bool = False, jobs: int = 1) -> dict:
+    """Run the stages of main.run once and time each of them
+
+    Args:
+        pack (str): The resource pack archive
+        work (str): The directory to extract and write to
+        in_memory (bool, optional): Work from the archive without extracting it. Defaults to False.
+        jobs (int, optional): The number of analysis processes. Defaults to 1.
+
+    Returns:
+        dict: The duration of each stage in seconds
+    """
+    timings = {}
+
+    # Time a stage
+    def timed(stage: str, function, *args):
+        start = time.perf_counter()
+        result = function(*args)
+        timings[stage] = time.perf_counter() - start
+        return result
+
+    # Start from empty caches
+    File.file_dict = {}
+    repair_string.cache_clear()
+    ReferenceCache.init(None)
+
+    # Read the tree from the archive, or extract it
+    extracted = os.path.join(work, "extract")
+    shutil.rmtree(extracted, ignore_errors=True)
+    if in_memory:
+        globvar.setRootPath(pack)
+        archive = ZipFile(pack)
+        timed("tree", PathMachine.init, globvar.root_path, archive)
+    else:
+        timed("unzip", extract, pack, extracted, config.EXTRACT_WORKERS)
+        globvar.setRootPath(extracted)
+        timed("tree", PathMachine.init, globvar.root_path)
+
+    # Plan the renames, build the files and analyse their references
+    timed("plan", PathMachine.planRenames)
+    timed("generateFiles", generateFiles)
+    timed("handleReferences", analyseReferences, list(File.file_dict.values()), jobs)
+
+    # Repair the names (the extracted files are not moved)
+    timed("rename", PathMachine.applyPlan)
+
+    # Write the output archive, from the archive as main.repair does
+    if in_memory:
+        output_path, config.OUTPUT_PATH = config.OUTPUT_PATH, os.path.join(work, "output")
+        os.makedirs(config.OUTPUT_PATH, exist_ok=True)
+        try:
+            timed("zip", main.repack, PackContext(pack, in_memory=True), PathMachine.getAffected())
+        finally:
+            config.OUTPUT_PATH = output_path
+        archive.close()
+    # Or from the extracted files, which are not moved, with their original paths
+    else:
+        output = os.path.join(work, "output.zip")
+        original_tree = PathMachine.getOriginalTree()
+        files = [(str(PathMachine.transformPathToSystemPath(original_tree[index])), str(file), str(original_tree[index])) for index, file in enumerate(PathMachine.getModifiedTree())]
+        timed("zip", write_archive, pack, output, files, config.COMPRESSION_CONFIG.method, config.COMPRESSION_CONFIG.level)
+
+    return timings
+
+def run():
+    # Parse the arguments
+    parser = ArgumentParser(prog="Stages benchmark", description="Time each stage of the handler on a synthetic resource pack")
+    add_arguments(parser)
+    parser.add_argument("-p", "--pack", dest="pack", help="Existing pack archive to use instead of a synthetic one", metavar="PATH")
+    parser.add_argument("-m", "--in-memory", dest="in_memory", help="Work from the archive without extracting it", action="store_true")
+    parser.add_argument("-j", "--jobs", dest="jobs", help="Number of analysis processes", type=int, default=1)
+    parser.add_argument("-r", "--repeat", dest="repeat", help="Number of runs, the fastest time of each stage is kept", type=int, default=3)
+    parser.add_argument("-o", "--output", dest="output", help="JSON file to write the results to (default: standard output)", metavar="FILE")
+    args = parser.parse_args()
+
+    # Only log the errors, the logging cost is not measured
+    mylog.setup("error", "error")
+
+    with tempfile.TemporaryDirectory() as work:
+        # Generate the pack
+        pack = args.pack
+        if not pack:
+            pack = os.path.join(work, "synthetic.zip")
+            generate(pack, **generator_arguments(args))
+
+        # Run the stages, keeping the fastest time of each one
+        stages = {}
+        for _ in range(max(args.repeat, 1)):
+            for stage, duration in run_stages(pack, work, args.in_memory, args.jobs).items():
+                stages[stage] = min(duration, stages.get(stage, duration))
+
+        # Describe the pack
+        with ZipFile(pack) as zip:
+            members = zip.infolist()
+        results = {
+            "pack": {
+                "path": args.pack,
+                "generator": None if args.pack else generator_arguments(args),
+                "members": len(members),
+                "analysed_files": len(File.file_dict),
+                "property_files": sum(isinstance(file, PropertyFile) for file in File.file_dict.values()),
+                "size": sum(zinfo.file_size for zinfo in members),
+            },
+            "options": {"in_memory": args.in_memory, "jobs": args.jobs, "repeat": args.repeat},
+            "python": platform.python_version(),
+            "stages": stages,
+            "total": sum(stages.values()),
+        }
+
+    # Write the results
+    output = json.dumps(results, indent=4)
+    if args.output:
+        Path(args.output).write_text(output + "\n")
+    else:
+        print(output)
+
+if __name__ == "__main__":
+    run()
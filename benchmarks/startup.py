@@ -0,0 +1,97 @@
+from argparse import ArgumentParser
+from pathlib import Path
+from typing import Dict, List
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from benchmarks.synthetic_pack import add_arguments, generate, generator_arguments
+
+# Root of the repository, the handler reads its configuration from there
+ROOT = Path(__file__).resolve().parent.parent
+
+# Time a command in a new interpreter
+def time_command(command: List[str], repeat: int) -> Dict[str, float]:
+    """Run a command several times and time it
+
+    Args:
+        command (List[str]): The command
+        repeat (int): The number of runs
+
+    Returns:
+        Dict[str, float]: The fastest and the median duration in seconds
+    """
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run(command, cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+        durations.append(time.perf_counter() - start)
+    return {"min": min(durations), "median": statistics.median(durations)}
+
+# Slowest imports of a module
+def slowest_imports(module: str, count: int) -> Dict[str, float]:
+    """Import a module with -X importtime and give the slowest imports
+
+    Args:
+        module (str): The module to import
+        count (int): The number of imports to keep
+
+    Returns:
+        Dict[str, float]: The cumulative import time in seconds of the slowest imports
+    """
+    output = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"], cwd=ROOT, capture_output=True, text=True, check=True).stderr
+    imports = {}
+    # Lines as "import time: self [us] | cumulative | name"
+    for line in output.splitlines()[1:]:
+        _, cumulative, name = line.split("|")
+        imports[name.strip()] = int(cumulative) / 1e6
+    return dict(sorted(imports.items(), key=lambda item: item[1], reverse=True)[:count])
+
+def run():
+    # Parse the arguments
+    parser = ArgumentParser(prog="Startup benchmark", description="Time the startup of the handler and an analysis of a tiny resource pack")
+    add_arguments(parser)
+    parser.set_defaults(directories=2, textures=10, properties=5)
+    parser.add_argument("-p", "--pack", dest="pack", help="Existing pack archive to use instead of a synthetic one", metavar="PATH")
+    parser.add_argument("-r", "--repeat", dest="repeat", help="Number of runs of each command", type=int, default=10)
+    parser.add_argument("-i", "--imports", dest="imports", help="Number of slowest imports of main to list", type=int, default=10)
+    parser.add_argument("-o", "--output", dest="output", help="JSON file to write the results to (default: standard output)", metavar="FILE")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as work:
+        # Generate the pack
+        pack = args.pack
+        if not pack:
+            pack = os.path.join(work, "tiny.zip")
+            generate(pack, **generator_arguments(args))
+        pack = os.path.abspath(pack)
+
+        # Time the interpreter alone, the import of the handler and an analysis without cache
+        repeat = max(args.repeat, 1)
+        commands = {
+            "interpreter": [sys.executable, "-c", "pass"],
+            "import": [sys.executable, "-c", "import main"],
+            "help": [sys.executable, "main.py", "--help"],
+            "analyse": [sys.executable, "main.py", "analyse", "-p", pack, "-m", "-q", "-nc"],
+        }
+        results = {
+            "pack": {"path": args.pack, "generator": None if args.pack else generator_arguments(args)},
+            "options": {"repeat": repeat},
+            "python": platform.python_version(),
+            "commands": {name: time_command(command, repeat) for name, command in commands.items()},
+            "imports": slowest_imports("main", args.imports),
+        }
+
+    # Write the results
+    output = json.dumps(results, indent=4)
+    if args.output:
+        Path(args.output).write_text(output + "\n")
+    else:
+        print(output)
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,130 @@
+from argparse import ArgumentParser
+from typing import Dict, List
+from zipfile import ZipFile, ZipInfo, ZIP_DEFLATED
+import json
+import random
+
+# Root of the generated OptiFine files
+optifine_root = "assets/minecraft/optifine"
+
+# Kinds of generated directories
+kinds = ["cit", "ctm", "cem"]
+
+# Give a name, broken (upper case, space and accent) or not
+def make_name(rng: random.Random, base: str, index: int, broken: float) -> str:
+    if rng.random() < broken:
+        return f"{base.capitalize()} {index} É"
+    return f"{base}_{index}"
+
+# Generate the files of a synthetic resource pack
+def generate_files(directories: int = 20, textures: int = 200, properties: int = 100, broken: float = 0.1, ambiguous: float = 0.1, seed: int = 0) -> Dict[str, bytes]:
+    """Generate the files of a synthetic resource pack
+
+    Args:
+        directories (int, optional): Number of CIT/CTM/CEM directories. Defaults to 20.
+        textures (int, optional): Number of textures. Defaults to 200.
+        properties (int, optional): Number of property files. Defaults to 100.
+        broken (float, optional): Fraction of broken directory and file names. Defaults to 0.1.
+        ambiguous (float, optional): Fraction of references only resolvable by stem. Defaults to 0.1.
+        seed (int, optional): Seed of the generator. Defaults to 0.
+
+    Returns:
+        Dict[str, bytes]: The content of each file by archive name
+    """
+    rng = random.Random(seed)
+    files = {"pack.mcmeta": json.dumps({"pack": {"pack_format": 9, "description": "Synthetic pack"}}).encode()}
+
+    # Directories, by kind in turn
+    directories = max(directories, 1)
+    dirs = [f"{optifine_root}/{kinds[i % len(kinds)]}/{make_name(rng, 'group', i, broken)}" for i in range(directories)]
+
+    # Textures, spread over the directories
+    pngs: List[List[str]] = [[] for _ in dirs]
+    for i in range(textures):
+        d = rng.randrange(len(dirs))
+        name = make_name(rng, "texture", i, broken)
+        pngs[d].append(name)
+        files[f"{dirs[d]}/{name}.png"] = b"\x89PNG\r\n\x1a\n" + rng.randbytes(64)
+    every_png = [(d, name) for d in range(len(dirs)) for name in pngs[d]]
+
+    # Reference to a texture from a directory
+    def reference(d: int) -> str:
+        # Only resolvable by stem: a texture of another directory by its name
+        if every_png and rng.random() < ambiguous:
+            _, name = rng.choice(every_png)
+            return name
+        # Relative to the directory
+        if pngs[d]:
+            name = rng.choice(pngs[d])
+            return rng.choice([f"./{name}.png", name, f"{name}.png"])
+        # Absolute or with the replaceable root
+        if every_png:
+            other, name = rng.choice(every_png)
+            path = f"{dirs[other]}/{name}"
+            return rng.choice(["/" + path, path.replace(f"{optifine_root}/", "~/", 1) + ".png"])
+        return "missing"
+
+    # Property files, spread over the directories
+    for i in range(properties):
+        d = rng.randrange(len(dirs))
+        kind = kinds[d % len(kinds)]
+        name = make_name(rng, kind, i, broken)
+        if kind == "cit":
+            lines = ["type=item", f"items=minecraft:item_{i}", f"texture={reference(d)}", f"nbt.display.Name=ipattern:*item {i}*"]
+        elif kind == "ctm":
+            lines = ["method=ctm", f"matchBlocks=block_{i}", "tiles=0-46", "connect=block"]
+        else:
+            lines = ["skins.2=2-3", "weights.2=10"]
+            # CEM textures are written with their extension
+            texture = reference(d)
+            if not texture.endswith(".png"):
+                texture += ".png"
+            files[f"{dirs[d]}/{name}.jem"] = json.dumps({"texture": texture, "models": []}).encode()
+        files[f"{dirs[d]}/{name}.properties"] = ("# Synthetic\n" + "\n".join(lines) + "\n").encode("ISO-8859-1")
+
+    return files
+
+# Write a synthetic resource pack archive
+def generate(path: str, **kwargs) -> int:
+    """Write a synthetic resource pack archive
+
+    Args:
+        path (str): The archive to write
+        **kwargs: The arguments of generate_files
+
+    Returns:
+        int: The number of files
+    """
+    files = generate_files(**kwargs)
+    with ZipFile(path, "w", ZIP_DEFLATED) as zip:
+        for name, content in files.items():
+            # Fixed dates so the archive only depends on the arguments
+            zip.writestr(ZipInfo(name, (2020, 1, 1, 0, 0, 0)), content, ZIP_DEFLATED)
+    return len(files)
+
+# Add the generator arguments to a parser
+def add_arguments(parser: ArgumentParser):
+    parser.add_argument("-d", "--directories", dest="directories", help="Number of CIT/CTM/CEM directories", type=int, default=20)
+    parser.add_argument("-t", "--textures", dest="textures", help="Number of textures", type=int, default=200)
+    parser.add_argument("-k", "--properties", dest="properties", help="Number of property files", type=int, default=100)
+    parser.add_argument("-b", "--broken", dest="broken", help="Fraction of broken names", type=float, default=0.1)
+    parser.add_argument("-a", "--ambiguous", dest="ambiguous", help="Fraction of references only resolvable by stem", type=float, default=0.1)
+    parser.add_argument("-s", "--seed", dest="seed", help="Seed of the generator", type=int, default=0)
+
+# Generator arguments from the parsed arguments
+def generator_arguments(args) -> dict:
+    return {key: getattr(args, key) for key in ("directories", "textures", "properties", "broken", "ambiguous", "seed")}
+
+def run():
+    # Parse the arguments
+    parser = ArgumentParser(prog="Synthetic pack generator", description="Generate a synthetic resource pack")
+    parser.add_argument("output", help="The archive to write")
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    # Generate the pack
+    count = generate(args.output, **generator_arguments(args))
+    print(f"{count} files written to {args.output}")
+
+if __name__ == "__main__":
+    run()
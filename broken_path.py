@@ -1,6 +1,8 @@
 import os
+import re
 import shutil
 import logging
+from functools import lru_cache
 from pathlib import Path
 
 # List of all valid characters for a path
@@ -56,19 +58,34 @@ replace_table = {
     "'": "_",
 }
 
-# Repair a broken path
-def repair_path(path: Path) -> Path:
-    # Replace replace_table characters
-    for char in replace_table.keys():
-        path = Path(str(path).replace(char, replace_table[char]))
+# Translation table of the replace table characters
+translate_table = str.maketrans(replace_table)
+
+# Regex matching all the invalid characters
+invalid_chars = re.compile("[^" + re.escape(valid_chars) + "]")
+
+# Repair a broken path string
+@lru_cache(maxsize=1 << 16)
+def repair_string(path: str) -> str:
+    """Repair a broken path string
+
+    Args:
+        path (str): The path to repair
+
+    Returns:
+        str: The repaired path, normalized like a Path
+    """
 
-    # Put all in lowercase
-    path = Path(str(path).lower())
+    # Replace replace_table characters and put all in lowercase
+    repaired = str(Path(path)).translate(translate_table).lower()
 
     # Remove all the invalid characters
-    for char in str(path):
-        if char not in valid_chars:
-            path = Path(str(path).replace(char, ""))
-    
+    repaired = invalid_chars.sub("", repaired)
+
+    # Return the repaired path
+    return str(Path(repaired))
+
+# Repair a broken path
+def repair_path(path: Path) -> Path:
     # Return the repaired path
-    return path
\ No newline at end of file
+    return Path(repair_string(str(path)))
@@ -1,8 +1,69 @@
-from dataclasses import dataclass
-from dacite import from_dict
+from dataclasses import dataclass, field
 import json
 import os
-from typing import List
+import re
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Compile regexes into a single alternation
+def compileAlternation(patterns: List[str], named: bool = False) -> re.Pattern:
+    """Compile regexes into a single alternation
+
+    Args:
+        patterns (List[str]): The regexes
+        named (bool, optional): Name each alternative after its index (r0, r1...). Defaults to False.
+
+    Returns:
+        re.Pattern: The compiled alternation, None if there is no pattern
+    """
+    # Nothing to match
+    if not patterns:
+        return None
+    # Join the patterns
+    if named:
+        return re.compile("|".join(f"(?P<r{index}>{pattern})" for index, pattern in enumerate(patterns)))
+    return re.compile("|".join(f"(?:{pattern})" for pattern in patterns))
+
+# Rules matching keys or paths, compiled into a single alternation
+class Rules:
+
+    def __init__(self, rules: Dict[str, object], default: object = None):
+        """Compile the rules, the first matching one gives the classification
+
+        Args:
+            rules (Dict[str, object]): The classifications by regex, in priority order
+            default (object, optional): The classification of the values matching no rule. Defaults to None.
+        """
+        # Regexes compiled once
+        self._regex = compileAlternation(list(rules), named=True)
+        self._classifications = list(rules.values())
+        self._default = default
+        # Classified values
+        self._classified = {}
+
+    # Classify a value
+    def classify(self, value: str) -> object:
+        """Classify a value with the first matching rule
+
+        Args:
+            value (str): The key or path
+
+        Returns:
+            object: The classification of the first matching rule, the default if none
+        """
+        # Already classified
+        if value in self._classified:
+            return self._classified[value]
+        # Find the first matching rule
+        match = self._regex.match(value) if self._regex else None
+        classification = self._classifications[int(match.lastgroup[1:])] if match else self._default
+        # Memoize the classification
+        self._classified[value] = classification
+        return classification
+
+    # Verify if a value matches any rule
+    def matches(self, value: str) -> bool:
+        # Not memoized, the paths are only checked once
+        return bool(self._regex and self._regex.match(value))
 
 @dataclass
 class PropertyFileConfig:
@@ -13,21 +74,145 @@ class PropertyFileConfig:
     excluded_pack_paths: list[str]
     # Non path properties
     non_path_properties: dict[str, bool]
-    
+
+    def __post_init__(self):
+        # The non path properties come first (None), by name or regex, then the expected extensions of the path properties
+        rules = {(key if is_regex else re.escape(key) + "$"): None for key, is_regex in self.non_path_properties.items()}
+        for key, extensions in self.properties_expected_extensions.items():
+            rules.setdefault(key, extensions)
+        self._keys = Rules(rules, default=[])
+        self._excluded = Rules(dict.fromkeys(self.excluded_pack_paths, True))
+
+    # Classify a property key
+    def classifyKey(self, key: str) -> Tuple[bool, List[str]]:
+        """Classify a property key
+
+        Args:
+            key (str): The property key
+
+        Returns:
+            Tuple[bool, List[str]]: If the property can contain a path, and its expected extensions
+        """
+        # None for the non path properties
+        extensions = self._keys.classify(key)
+        return (False, []) if extensions is None else (True, extensions)
+
+    # Verify if a pack path is excluded
+    def isExcludedPath(self, path: str) -> bool:
+        # Match any of the excluded paths
+        return self._excluded.matches(path)
+
+
+@dataclass
+class JsonFileConfig:
+    """The configuration for the JSON files (models, blockstates, CEM and mcmeta)"""
+    # Expected extensions of the references by key path (keys of the enclosing members joined by dots)
+    references_expected_extensions: dict[str, List[str]]
+    # Folder of the namespaced ids (namespace:path) by expected extension
+    namespace_folders: dict[str, str]
+    # Excluded paths (regex)
+    excluded_pack_paths: list[str]
+
+    def __post_init__(self):
+        # Key paths matching no rule are not references (None)
+        self._keys = Rules(self.references_expected_extensions)
+        self._excluded = Rules(dict.fromkeys(self.excluded_pack_paths, True))
+
+    # Classify a key path
+    def classifyKey(self, key_path: str) -> List[str]:
+        """Classify the key path of a JSON string
+
+        Args:
+            key_path (str): The keys of the enclosing members joined by dots
+
+        Returns:
+            List[str]: The expected extensions, None if the string is not a reference
+        """
+        # First rule giving the expected extensions
+        return self._keys.classify(key_path)
+
+    # Verify if a pack path is excluded
+    def isExcludedPath(self, path: str) -> bool:
+        # Match any of the excluded paths
+        return self._excluded.matches(path)
+
+
+@dataclass
+class OrphanConfig:
+    """The files listed as orphans when no analysed file references them"""
+    # Extensions of the files that can be orphans
+    extensions: List[str]
+    # Paths that can contain orphans (regex), the files of the other paths may be used by the game without reference
+    pack_paths: list[str]
+    # Stem suffixes of the files used with the file of the same base stem (emissive textures)
+    implicit_suffixes: List[str]
+
+    def __post_init__(self):
+        # Regexes compiled once
+        self._paths = Rules(dict.fromkeys(self.pack_paths, True))
+
+    # Verify if a pack path can be an orphan
+    def isCandidate(self, path: str) -> bool:
+        # Extension and path
+        return path.endswith(tuple(self.extensions)) and self._paths.matches(path)
+
+
+@dataclass
+class CompressionConfig:
+    """The compression of the output archive"""
+    # Compression method (stored, deflated, bzip2 or lzma)
+    method: str = "deflated"
+    # Compression level (None for the method default)
+    level: Optional[int] = None
+
 
 @dataclass
 class Config:
     output_path: str
     property_file_config: PropertyFileConfig
+    # References of the JSON files
+    json_file_config: JsonFileConfig
+    # Files that can be orphans
+    orphans: OrphanConfig
+    # Number of extraction workers (0 for the CPU count)
+    extract_workers: int = 0
+    # Compression of the rewritten files
+    compression: CompressionConfig = field(default_factory=CompressionConfig)
+    # Cache of the analysed property files (empty to disable)
+    cache_path: str = "cache.sqlite"
+
+# Load the configuration
+def loadConfig() -> Config:
+    """Load and validate the configuration file, or the default one if there is none
+
+    Returns:
+        Config: The configuration
+    """
+    # Only imported when the configuration is loaded
+    from dacite import from_dict
+    # If config file exists, load it, else load the default config
+    path = "config/config.json" if os.path.exists("config/config.json") else "config/default/config.json"
+    with open(path) as f:
+        return from_dict(Config, json.load(f))
+
+# Values of the module, loaded with the configuration on first access
+_values: Dict[str, Callable[[Config], object]] = {
+    "config": lambda config: config,
+    "PROPERTY_CONFIG": lambda config: config.property_file_config,
+    "JSON_CONFIG": lambda config: config.json_file_config,
+    "ORPHAN_CONFIG": lambda config: config.orphans,
+    "OUTPUT_PATH": lambda config: config.output_path,
+    "EXTRACT_WORKERS": lambda config: config.extract_workers,
+    "COMPRESSION_CONFIG": lambda config: config.compression,
+    "CACHE_PATH": lambda config: config.cache_path,
+}
 
-# If config file exists, load it
-if os.path.exists("config/config.json"):
-    with open("config/config.json") as f:
-        config = from_dict(Config, json.load(f))
-else:
-    # Load default config
-    with open("config/default/config.json") as f:
-        config = from_dict(Config, json.load(f))
-
-PROPERTY_CONFIG = config.property_file_config
-OUTPUT_PATH = config.output_path
\ No newline at end of file
+# Load the configuration on the first access to one of its values
+def __getattr__(name: str):
+    # Not a configuration value
+    if name not in _values:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    # Load the configuration once, the values become plain module attributes
+    config = loadConfig()
+    globals().update({key: value(config) for key, value in _values.items()})
+    return globals()[name]
\ No newline at end of file
@@ -1,157 +1,447 @@
 import globvar
-from FileTypes import generateFiles, File
-from argparse import ArgumentParser
+from FileTypes import generateFiles, analyseReferences, File
+from argparse import ArgumentParser, Namespace
+from typing import Iterable, List, Set
 from zipfile import ZipFile
-import logging
+import glob
 import os
+import sys
+import time
 import mylog
 from PathMachine import PathMachine
-from broken_path import repair_path
-import shutil
-import cProfile
-from concurrent.futures import ProcessPoolExecutor
-from config.config import OUTPUT_PATH
+from PackPath import PackPath
+from RenamePlan import RenamePlan
+from archive import extract, rewrite_archive, write_archive
+from config import config
+from ReferenceCache import ReferenceCache
+from RunStats import RunStats
+from PackContext import PackContext
+from Progress import Progress
+from Details import Details
 from pathlib import Path
 
 # Unzip the resource pack
-def unzip():
+def unzip(context: PackContext):
     # Get the name of the resource pack
-    name = args.path.split("/")[-1].replace(".zip", "/")
+    name = context.name.replace(".zip", "/")
     # Exatract the resource pack
-    print("Extracting resource pack...")
-    logging.info("Extracting resource pack...")
+    mylog.display("Extracting resource pack...")
     if os.path.exists(f"./extracts/{name}"):
-        logging.info("Removing old extract...")
+        mylog.log("Removing old extract...")
         os.system(f"rm -r ./extracts/{name}")
-    with ZipFile(args.path, 'r') as zip:
-        # list of all files to unzip
-        files = zip.namelist()
-    # determine chunksize
-    n_workers = 8
-    chunksize = round(len(files) / n_workers)
-    with ProcessPoolExecutor(n_workers) as exe:
-        # split the copy operations into chunks
-        for i in range(0, len(files), chunksize):
-            # select a chunk of filenames
-            filenames = files[i:(i + chunksize)]
-            # submit the batch copy task
-            _ = exe.submit(unzip_files, args.path, filenames, f"./extracts/{name}")
+    # Extract the files with the workers
+    mylog.flush()
+    with RunStats.stage("extract") as stage, Progress("Extracting") as progress:
+        count = stage["items"] = extract(context.path, f"./extracts/{name}", context.extract_workers, progress.advance)
     # Return the path to the extracted resource pack
-    print("Extracted resource pack to ./extracts/" + name)
-    logging.info("Resource pack extracted at ./extracts/" + name)
+    mylog.display("Extracted %d files of resource pack to ./extracts/%s", count, name)
     return f"./extracts/{name}"
 
-# unzip files from an archive
-def unzip_files(zip_filename, filenames, path):
-    # open the zip file
-    with ZipFile(zip_filename, 'r') as handle:
-        # unzip multiple files
-        for filename in filenames:
-            # unzip the file
-            handle.extract(filename, path)
-            # report progress
-            print(f'.unzipped {filename}')
-
 # Zip to output directory
-def zip():
+def zip(context: PackContext, dropped: Set[str] = frozenset()):
     # Get the name of the resource pack
-    name = args.path.split("/")[-1]
+    name = context.name
     # Zip the resource pack
-    print("Zipping resource pack...")
-    logging.info("Zipping resource pack...")
-    with ZipFile(str(Path(OUTPUT_PATH).resolve()) + f"/{name}", 'w') as zip:
-        for file in PathMachine.getModifiedTree():
-            zip.write(str(PathMachine.transformPathToSystemPath(file)), str(file))
+    mylog.display("Zipping resource pack...")
+    # Files as (system path, name in the output, name in the input), without the dropped ones
+    original_tree = PathMachine.getOriginalTree()
+    files = [(str(PathMachine.transformPathToSystemPath(file)), str(file), str(original_tree[index])) for index, file in enumerate(PathMachine.getModifiedTree()) if str(original_tree[index]) not in dropped]
+    # Write the files, copying the unchanged ones from the input
+    with RunStats.stage("zip") as stage, Progress("Zipping", len(files)) as progress:
+        copied = write_archive(context.path, str(Path(config.OUTPUT_PATH).resolve()) + f"/{name}", files, config.COMPRESSION_CONFIG.method, config.COMPRESSION_CONFIG.level, progress.advance)
+        stage["items"] = len(files)
+    RunStats.count("zip.copied", copied)
+    mylog.log("%d unchanged files copied without recompressing", copied)
     # Return the path to the extracted resource pack
-    print("Zipped resource pack to ./output/" + name)
-    logging.info("Resource pack zipped at ./output/" + name)
+    mylog.display("Zipped resource pack to ./output/%s", name)
+
+# Repack the resource pack from the archive to the output directory
+def repack(context: PackContext, rewritten: Iterable[str] = (), dropped: Set[str] = frozenset()):
+    # Get the name of the resource pack
+    name = context.name
+    # Repack the resource pack
+    mylog.display("Repacking resource pack...")
+    # New content of the rewritten files
+    contents = {}
+    for path in rewritten:
+        file = File.file_dict[path]
+        content = file.render()
+        if content is not None:
+            contents[PathMachine.getArchiveMember(file._packRelativePath).filename] = content
+    # Give the repaired name of a member, None for the dropped ones
+    def rename(member: str) -> str:
+        path = PackPath.of("/" + member.strip("/"))
+        if str(path) in dropped:
+            return None
+        path = PathMachine.getModifiedPath(path)
+        return str(path).lstrip("/") + ("/" if member.endswith("/") else "")
+    # Stream the members to the output archive
+    with RunStats.stage("zip") as stage, Progress("Repacking") as progress:
+        skipped = rewrite_archive(context.path, str(Path(config.OUTPUT_PATH).resolve()) + f"/{name}", rename, contents, config.COMPRESSION_CONFIG.method, config.COMPRESSION_CONFIG.level, progress.advance)
+        stage["items"] = len(PathMachine.getOriginalTree()) - len(skipped)
+    RunStats.count("zip.skipped", len(skipped))
+    for member in skipped:
+        mylog.display("Skipped '%s' because its repaired name '%s' is already used", member, rename(member), level="warning")
+        Details.write("skipped", path=member, repaired=rename(member))
+    # Return the path to the repacked resource pack
+    mylog.display("Repacked resource pack to ./output/%s", name)
+
+# Find the orphaned files
+def findOrphans() -> List[Path]:
+    """Find the files no analysed file references, from the reference graph
+
+    Returns:
+        List[Path]: The orphaned files
+    """
+    mylog.display("Finding orphaned files...")
+    with RunStats.stage("orphans") as stage:
+        orphans = PathMachine.getOrphans(config.ORPHAN_CONFIG)
+        stage["items"] = len(orphans)
+    # The details go to the log and details files
+    for path in orphans:
+        mylog.log("Found orphaned file '%s'", path)
+        Details.write("orphan", path=str(path))
+    mylog.display("Found %d orphaned files", len(orphans))
+    return orphans
+
+# Find the broken paths in the rename plan
+def findBrokenPaths(event: str) -> RenamePlan:
+    """Log the renames of the plan and warn about the repaired names already used
+
+    Args:
+        event (str): The kind of the rename items in the details file
+
+    Returns:
+        RenamePlan: The rename plan
+    """
+    mylog.display("Finding broken paths...")
+    plan = PathMachine.getPlan()
+    # The details go to the log and details files
+    for original, current, new in plan.renames:
+        mylog.log("Found broken path in '%s' Correct path: '%s'", original, new)
+        Details.write(event, path=str(original), repaired=str(new))
+    # The collisions are resolved with a suffix, warn about them
+    for original, repaired in plan.collisions:
+        mylog.display("'%s' is renamed to '%s' because '%s' is already used", original, plan.target(original), repaired, level="warning")
+        Details.write("collision", path=str(original), repaired=str(plan.target(original)), used=str(repaired))
+    mylog.display("Found %d broken paths", len(plan.renames))
+    return plan
 
 # Actions
 # Analyze the resource pack
-def analyse():
+def analyse(context: PackContext):
     # Analyse references
     mylog.display("Analyzing references...")
-    # For each file
-    for file in File.file_dict.values():
-        # Analyze the file
-        file.handleReferences()
+    with RunStats.stage("references") as stage, Progress("References", len(File.file_dict)) as progress:
+        analyseReferences(list(File.file_dict.values()), context.jobs, progress.advance)
+        stage["items"] = len(File.file_dict)
     # Finding all broken paths
-    mylog.display("Finding broken paths:")
-    for file in PathMachine.getOriginalTree():
-        if not file.name == repair_path(file.name).name:
-            mylog.display(f"Found broken path in '{str(file)}' Correct path: '{str(repair_path(file))}'")
+    findBrokenPaths("broken_path")
+    # Finding the orphaned files
+    findOrphans()
 
 # Repair the resource pack
-def repair():
+def repair(context: PackContext):
     # Analyse references
     mylog.display("Analyzing and correct references...")
-    # For each file
-    for file in File.file_dict.values():
-        # Analyze the file
-        file.handleReferences()
-        file.rewrite()
-    # Sort the paths
-    files = sorted(PathMachine.getOriginalTree(), key=lambda x: len(str(x)), reverse=True)
-    # Finding all broken paths
-    mylog.display("Finding broken paths:")
-    for file in files:
-        if not file.name == repair_path(file.name).name:
-            mylog.display(f"Found broken path in '{str(file)}' Correct path: '{str(repair_path(file))}'")
-            # Move
-            shutil.move(str(PathMachine.transformPathToSystemPath(file)), str(PathMachine.transformPathToSystemPath(repair_path(file))))
-            # Update the path
-        PathMachine.update(file, repair_path(file))
-    # Zip resource pack
-    zip()
-
-def comment():
+    with RunStats.stage("references") as stage, Progress("References", len(File.file_dict)) as progress:
+        analyseReferences(list(File.file_dict.values()), context.jobs, progress.advance)
+        stage["items"] = len(File.file_dict)
+    # Orphaned files, dropped from the output when asked
+    orphans = findOrphans()
+    dropped = {str(path) for path in orphans} if args.drop_orphans else set()
+    # Finding all broken paths and update the tree, the referrers of a renamed path are affected
+    plan = findBrokenPaths("renamed")
+    with RunStats.stage("rename") as stage:
+        PathMachine.applyPlan()
+        stage["items"] = len(plan.renames)
+    # Only the files referencing a renamed path have to be rewritten
+    affected = PathMachine.getAffected()
+    mylog.display("%d files have renamed or ambiguous references", len(affected))
+    # Show the changes without applying them
+    if args.dry_run:
+        for original, current, new in plan.renames:
+            mylog.display("Would rename '%s' to '%s'", current, new)
+        for path in affected:
+            mylog.display("Would rewrite '%s'", path)
+        for path in sorted(dropped):
+            mylog.display("Would drop '%s'", path)
+        return
+    # Rewrite the files, then rename them parents first, on disk when extracted
+    if not context.in_memory:
+        with RunStats.stage("rewrite") as stage:
+            for path in affected:
+                File.file_dict[path].rewrite()
+            stage["items"] = len(affected)
+        with RunStats.stage("rename"):
+            for original, current, new in plan.renames:
+                os.rename(PathMachine.transformPathToSystemPath(current), PathMachine.transformPathToSystemPath(new))
+    mylog.display("Repaired %d broken paths", len(plan.renames))
+    # Drop the orphaned files
+    if dropped:
+        mylog.display("Dropping %d orphaned files from the output", len(dropped))
+    # Repack from the archive, or zip the extracted resource pack
+    if context.in_memory:
+        repack(context, affected, dropped)
+    else:
+        zip(context, dropped)
+
+# Keep the analysis of an unpacked resource pack up to date
+def watch(context: PackContext):
+    # Analyse the pack once, the cache is only used for this first analysis
+    analyse(context)
+    ReferenceCache.close()
+    # Then analyse the changes and answer the queries until stopped
+    from PackWatcher import PackWatcher
+    PackWatcher(args.interval, args.socket).run()
+
+def comment(context: PackContext):
     pass
 
 
 # Format the resource pack
-def format():
+def format(context: PackContext):
     pass
 
 # Actions that can be performed
 actions = {
     "repair": repair,
     "comment": comment,
-    "analyse": analyse
+    "analyse": analyse,
+    "watch": watch
 }
 
+# Parsed arguments (set by main, and in the batch workers)
+args = None
+
 # Parse the arguments
-# Init the argument parser
-parser = ArgumentParser(prog="Resource pack handler", description="Handle different actions on resource packs")
-# Add the arguments
-# Action
-parser.add_argument('action', help='The action to perform on your resource pack', choices=['repair', 'analyse'], metavar='ACTION')
-# Path
-parser.add_argument("-p", "--path", dest="path", help="Path of your resource pack", metavar="PATH", required=True)
-# Enable profiling
-parser.add_argument("-pr", "--profile", dest="profile", help="Enable profiling", action="store_true")
-args = parser.parse_args()
-
-def run():
-    print()
+def parseArguments(argv: List[str] = None) -> Namespace:
+    """Parse the command line arguments
+
+    Args:
+        argv (List[str], optional): The arguments. Defaults to the arguments of the process.
+
+    Returns:
+        Namespace: The parsed arguments
+    """
+    # Init the argument parser
+    parser = ArgumentParser(prog="Resource pack handler", description="Handle different actions on resource packs")
+    # Add the arguments
+    # Action
+    parser.add_argument('action', help='The action to perform on your resource pack', choices=['repair', 'analyse', 'watch'], metavar='ACTION')
+    # Path
+    parser.add_argument("-p", "--path", dest="path", help="Path of your resource pack, several paths or glob patterns to handle a batch of packs", metavar="PATH", nargs="+", required=True)
+    # Enable profiling
+    parser.add_argument("-pr", "--profile", dest="profile", help="Enable profiling", action="store_true")
+    # Read the pack from the archive without extracting it
+    parser.add_argument("-m", "--in-memory", dest="in_memory", help="Work directly from the archive, without extracting it", action="store_true")
+    # Number of analysis workers
+    parser.add_argument("-j", "--jobs", dest="jobs", help="Number of processes analysing the references, or handling the packs of a batch (0 for the CPU count)", metavar="JOBS", type=int, default=1)
+    # Disable the cache
+    parser.add_argument("-nc", "--no-cache", dest="no_cache", help="Analyse every file again instead of reusing the previous runs", action="store_true")
+    # Console log level
+    parser.add_argument("-l", "--log-level", dest="log_level", help="Lowest level displayed on the console", choices=list(mylog.levels), default="debug")
+    # Log file level
+    parser.add_argument("-fl", "--file-log-level", dest="file_log_level", help="Lowest level written to the log file (default: the console level), the messages of lower levels are not even formatted", choices=list(mylog.levels))
+    # Quiet mode
+    parser.add_argument("-q", "--quiet", dest="quiet", help="Only display the errors on the console", action="store_true")
+    # Report of the run
+    parser.add_argument("-r", "--report", dest="report", help="Write the stage timings and the counters of the run to a JSON file", metavar="FILE")
+    # Details of the run
+    parser.add_argument("-d", "--details", dest="details", help="Write the details of each item (broken paths, orphans, skipped members) to a JSON lines file", metavar="FILE")
+    # Drop the orphaned files
+    parser.add_argument("-do", "--drop-orphans", dest="drop_orphans", help="Leave the orphaned files (referenced by no analysed file) out of the repaired resource pack", action="store_true")
+    # Show the changes of repair without applying them
+    parser.add_argument("-n", "--dry-run", dest="dry_run", help="Show the renames, rewrites and dropped files of repair without applying them", action="store_true")
+    # Reference graph
+    parser.add_argument("-g", "--graph", dest="graph", help="Write the reference graph of each pack next to its output", action="store_true")
+    # Seconds between two scans of a watched pack
+    parser.add_argument("-i", "--interval", dest="interval", help="Seconds between two scans of the watched pack directory", metavar="SECONDS", type=float, default=1.0)
+    # Local socket answering the queries of a watched pack
+    parser.add_argument("-s", "--socket", dest="socket", help="Also answer the queries of the watched pack on this local TCP port (0 for any free port)", metavar="PORT", type=int)
+    return parser.parse_args(argv)
+
+# Handle a resource pack in its context
+def processPack(context: PackContext) -> dict:
+    """Read a resource pack and execute the action on it, in the active context
+
+    Args:
+        context (PackContext): The active pack context
+
+    Returns:
+        dict: The report of the pack
+    """
+    # Read the pack from the archive
+    if context.in_memory:
+        globvar.setRootPath(context.path)
+        mylog.display("Analyzing resource pack from archive...")
+        with RunStats.stage("tree") as stage:
+            PathMachine.init(globvar.root_path, ZipFile(context.path, 'r'))
+            stage["items"] = len(PathMachine.getOriginalTree())
+    # Watch an unpacked resource pack in place
+    elif args.action == "watch":
+        globvar.setRootPath(context.path)
+        mylog.display("Analyzing unpacked resource pack...")
+        with RunStats.stage("tree") as stage:
+            PathMachine.init(globvar.root_path)
+            stage["items"] = len(PathMachine.getOriginalTree())
+    # Else extract it and set the root path
+    else:
+        path=unzip(context)
+        globvar.setRootPath(path)
+        mylog.display("Analyzing resource pack...")
+        with RunStats.stage("tree") as stage:
+            PathMachine.init(globvar.root_path)
+            stage["items"] = len(PathMachine.getOriginalTree())
+    # Plan the renames, the repaired references follow the plan
+    with RunStats.stage("plan") as stage:
+        stage["items"] = len(PathMachine.planRenames().renames)
+    # Open the cache of the previous runs
+    ReferenceCache.init(None if args.no_cache else config.CACHE_PATH)
+    try:
+        with RunStats.stage("files") as stage:
+            generateFiles()
+            stage["items"] = len(File.file_dict)
+        # Execute the action
+        mylog.display("Executing action %s", args.action)
+        action = actions[args.action]
+        if action != None:
+            action(context)
+        # Write the reference graph next to the output
+        if args.graph:
+            graph = str(Path(config.OUTPUT_PATH).resolve()) + "/" + os.path.splitext(context.name)[0] + ".references.json"
+            PathMachine.saveGraph(graph)
+            mylog.display("Reference graph written to %s", graph)
+    finally:
+        # Save the cache and close the archive
+        ReferenceCache.close()
+        PathMachine.closeArchive()
+    # Display the summary
+    RunStats.summary()
+    return RunStats.getReport()
+
+# Handle a resource pack of a batch in a worker
+def _processPackTask(path: str) -> tuple:
+    # Each pack has its own context, the worker state is not shared between packs
+    context = PackContext(path, args.in_memory, jobs=1, extract_workers=1)
+    # Capture the records and the details to write them in the batch order
+    with mylog.capture() as records, Details.capture() as details:
+        try:
+            with context.activate():
+                mylog.display("Resource pack: %s", context.path)
+                return records, details, processPack(context), None
+        except Exception as e:
+            mylog.display("Failed to handle %s: %s", context.path, e, level="error")
+            return records, details, None, f"{type(e).__name__}: {e}"
+
+# Set the arguments and the log levels in a batch worker
+def _initBatchWorker(arguments: Namespace, thresholds: tuple):
+    global args
+    args = arguments
+    mylog.setLevels(thresholds)
+
+# Handle a batch of resource packs
+def batch(paths: List[str]) -> int:
+    """Handle several resource packs concurrently with a shared pool of workers
+
+    Args:
+        paths (List[str]): The resource pack archives
+
+    Returns:
+        int: The exit code, 1 if a pack failed
+    """
+    start = time.perf_counter()
+    # The extract directory and the output archive are named after the pack, the names must be unique
+    names = {}
+    for path in paths:
+        names.setdefault(os.path.basename(path.replace("\\", "/")), []).append(path)
+    duplicates = {name: same for name, same in names.items() if len(same) > 1}
+    for name, same in duplicates.items():
+        mylog.display("Several resource packs are named %s: %s", name, ", ".join(same), level="error")
+    if duplicates:
+        return 1
+    jobs = args.jobs or os.cpu_count() or 1
+    mylog.display("Handling %d resource packs with %d workers...", len(paths), min(jobs, len(paths)))
+    # Reports and errors by pack
+    reports = {}
+    failed = 0
+    # Handle the packs with the workers, in order
+    from concurrent.futures import ProcessPoolExecutor
+    mylog.flush()
+    with ProcessPoolExecutor(min(jobs, len(paths)), initializer=_initBatchWorker, initargs=(args, mylog.getLevels())) as exe, Progress("Resource packs", len(paths)) as progress:
+        futures = [exe.submit(_processPackTask, path) for path in paths]
+        for index, future in enumerate(futures):
+            records, details, report, error = future.result()
+            mylog.replay(records)
+            Details.replay(details, pack=paths[index])
+            reports[paths[index]] = {"report": report, "error": error}
+            failed += error is not None
+            progress.advance()
+    # Display the summary of the batch
+    mylog.display("Batch: %d resource packs handled, %d failed in %.3fs", len(paths) - failed, failed, time.perf_counter() - start, level="error" if failed else "info")
+    if args.report:
+        RunStats.writeReport(args.report, {"packs": reports})
+        mylog.display("Report written to %s", args.report)
+    return 1 if failed else 0
+
+# Expand the paths and glob patterns of the packs
+def expandPaths(patterns: List[str]) -> List[str]:
+    paths = []
+    for pattern in patterns:
+        pattern = pattern.replace("\\", "/")
+        # Patterns matching nothing are kept to report them
+        paths.extend(sorted(glob.glob(pattern)) or [pattern])
+    # A pack matched by several patterns is handled once
+    return list(dict.fromkeys(paths))
+
+def run() -> int:
+    # Configure the console and the log file, the answers of a watched pack are on the standard output
+    mylog.setup(args.log_level, args.file_log_level or args.log_level, quiet=args.quiet, stream=sys.stderr if args.action == "watch" else None)
+    mylog.console().write("\n")
     # Log start
     mylog.display("Starting resource pack handler...")
-    mylog.display("Action: " + args.action)
-    # Convert windows path to linux path
-    args.path = args.path.replace("\\", "/")
-    # Set the root path
-    path=unzip()
-    globvar.setRootPath(path)
-    mylog.display("Analyzing resource pack...")
-    PathMachine.init(globvar.root_path)
-    generateFiles()
-    # Execute the action
-    mylog.display(f"Executing action {args.action}")
-    action = actions[args.action]
-    if action != None:
-        action()
+    mylog.display("Action: %s", args.action)
+    # Find the packs
+    paths = expandPaths(args.path)
+    # Only one unpacked pack can be watched
+    if args.action == "watch" and (len(paths) > 1 or args.in_memory or not os.path.isdir(paths[0])):
+        mylog.display("Watch expects the directory of one unpacked resource pack", level="error")
+        return 1
+    # Open the details file
+    Details.open(args.details)
+    try:
+        # Handle a batch of packs
+        if len(paths) > 1:
+            return batch(paths)
+        # Handle a single pack
+        context = PackContext(paths[0], args.in_memory, args.jobs, config.EXTRACT_WORKERS)
+        with context.activate():
+            processPack(context)
+            # Write the report
+            if args.report:
+                RunStats.writeReport(args.report)
+                mylog.display("Report written to %s", args.report)
+        return 0
+    finally:
+        Details.close()
 
-if __name__ == "__main__":
+def main(argv: List[str] = None) -> int:
+    """Parse the arguments and run the handler, nothing is done when the module is imported (by the workers)
+
+    Args:
+        argv (List[str], optional): The arguments. Defaults to the arguments of the process.
+
+    Returns:
+        int: The exit code, not 0 if a pack failed
+    """
+    global args
+    args = parseArguments(argv)
     if args.profile:
-        cProfile.run("run()", sort="cumtime")
-    else:
-        run()
+        import cProfile
+        namespace = {}
+        cProfile.runctx("code = run()", globals(), namespace, sort="cumtime")
+        return namespace["code"]
+    return run()
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,20 +1,213 @@
+import atexit
 import logging
+import queue
+import sys
+import threading
+from contextlib import contextmanager
 
-logging.basicConfig(filename=f'logs.log', encoding='utf-8', level=logging.DEBUG)
-
-logging_commands = {
-    "error": logging.error,
-    "warning": logging.warning,
-    "info": logging.info,
-    "debug": logging.debug
+# Levels by name
+levels = {
+    "error": logging.ERROR,
+    "warning": logging.WARNING,
+    "info": logging.INFO,
+    "debug": logging.DEBUG
 }
 
+# Console and file thresholds
+_console_level = logging.DEBUG
+_file_level = logging.DEBUG
+
+# Handler enqueuing the records for the background thread writing the log file
+# (not logging.handlers.QueueHandler and QueueListener, importing logging.handlers also imports socket and pickle)
+class _QueueHandler(logging.Handler):
+
+    def __init__(self, handler: logging.Handler):
+        """Start the thread writing the records to a handler
+
+        Args:
+            handler (logging.Handler): The handler writing the log file
+        """
+        super().__init__()
+        self._handler = handler
+        self._queue = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    # Enqueue a record, its message is already formatted
+    def emit(self, record: logging.LogRecord):
+        self._queue.put(record)
+
+    # Write the records until closed
+    def _run(self):
+        while (record := self._queue.get()) is not None:
+            self._handler.handle(record)
+
+    # Write the pending records and stop the thread
+    def close(self):
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+            self._handler.close()
+        super().close()
+
+# Handler of the log file (None until configured)
+_listener: _QueueHandler = None
+
+# The log file is configured on the first record when setup was not called
+_configured = False
+
+# Captured records (None when not capturing)
+_captured = None
+
+# A progress line is displayed on the terminal and must be erased before a message
+_status_line = False
+
+# Console stream (None for the standard output)
+_console = None
+
+# Configure the console and the log file
+def setup(console_level: str = "debug", file_level: str = "debug", quiet: bool = False, filename: str = "logs.log", stream=None):
+    """Configure the console and the log file
+
+    Args:
+        console_level (str, optional): Lowest level displayed on the console. Defaults to "debug".
+        file_level (str, optional): Lowest level written to the log file. Defaults to "debug".
+        quiet (bool, optional): Only display the errors on the console. Defaults to False.
+        filename (str, optional): The log file. Defaults to "logs.log".
+        stream (TextIO, optional): The console stream. Defaults to the standard output.
+    """
+    global _console_level, _file_level, _listener, _configured, _console
+
+    # Set the thresholds and the console
+    _console_level = levels["error"] if quiet else levels[console_level]
+    _file_level = levels[file_level]
+    _console = stream
+
+    # Stop the previous listener
+    shutdown()
+
+    # The log file is written by a background thread
+    handler = logging.FileHandler(filename, encoding="utf-8")
+    handler.setFormatter(logging.Formatter(logging.BASIC_FORMAT))
+    _listener = _QueueHandler(handler)
+
+    # The root logger only enqueues the records
+    root = logging.getLogger()
+    for previous in root.handlers[:]:
+        root.removeHandler(previous)
+    root.addHandler(_listener)
+    root.setLevel(_file_level)
+    _configured = True
+
+# Write a record to the log file, configured with the defaults on first use
+def _write(level: str, message: str):
+    if not _configured:
+        setup()
+    logging.log(levels[level], message)
+
+# Get the console and file thresholds, to set them in the workers
+def getLevels() -> tuple:
+    return _console_level, _file_level
+
+# Set the console and file thresholds in a worker, its records are captured and emitted by the main process
+def setLevels(thresholds: tuple):
+    global _console_level, _file_level
+    _console_level, _file_level = thresholds
+
+# Flush and stop the log file thread
+def shutdown():
+    global _listener
+    if _listener is not None:
+        _listener.close()
+        _listener = None
+
+atexit.register(shutdown)
+
+# Get the console stream
+def console():
+    return _console or sys.stdout
+
+# Flush the console, before forking workers so they don't inherit pending output
+def flush():
+    console().flush()
+
+# Tell if a progress line is displayed on the terminal
+def setStatusLine(active: bool):
+    global _status_line
+    _status_line = active
+
+# Verify if a level would be displayed or logged
+def isEnabled(level="info", displayed=True) -> bool:
+    return levels[level] >= _file_level or (displayed and levels[level] >= _console_level)
+
+# Verify if a level would be written on the console now (not while capturing)
+def isDisplayed(level="info") -> bool:
+    return _captured is None and levels[level] >= _console_level
+
 # Explicit display
-def display(message, level="info"):
-    print(message, flush=True)
-    log(message, level)
+def display(message, *args, level="info"):
+    """Display a message on the console and log it
+
+    Args:
+        message (str): The message, formatted with args only if the level is enabled
+        level (str, optional): The level. Defaults to "info".
+    """
+    # Nothing to do for disabled levels
+    if not isEnabled(level):
+        return
+    # Format the message
+    if args:
+        message = message % args
+    # Capture the record
+    if _captured is not None:
+        _captured.append((message, level, True))
+        return
+    # Display and log it
+    if levels[level] >= _console_level:
+        console().write(("\r\033[K" if _status_line else "") + message + "\n")
+    if levels[level] >= _file_level:
+        _write(level, message)
 
 # Implicit display
-def log(message, level="info"):
-    logging_commands[level](message)
-    
\ No newline at end of file
+def log(message, *args, level="info"):
+    """Log a message without displaying it
+
+    Args:
+        message (str): The message, formatted with args only if the level is enabled
+        level (str, optional): The level. Defaults to "info".
+    """
+    # Nothing to do for disabled levels
+    if not isEnabled(level, displayed=False):
+        return
+    # Format the message
+    if args:
+        message = message % args
+    # Capture the record
+    if _captured is not None:
+        _captured.append((message, level, False))
+        return
+    # Log it
+    _write(level, message)
+
+# Capture the records instead of emitting them
+@contextmanager
+def capture():
+    """Capture the displayed and logged records instead of emitting them
+
+    Yields:
+        list: The captured records, to emit later with replay
+    """
+    global _captured
+    previous, _captured = _captured, []
+    try:
+        yield _captured
+    finally:
+        _captured = previous
+
+# Emit captured records
+def replay(records):
+    for message, level, displayed in records:
+        if displayed:
+            display(message, level=level)
+        else:
+            log(message, level=level)